@@ -0,0 +1,305 @@
+import sys
+import time
+import queue
+import struct
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import Future
+import cv2
+import numpy as np
+import mss
+import frame_pool
+
+
+# ================= 屏幕捕捉部分 =================
+# 截图进程和服务端进程共用这几个函数; 截图进程只导入本模块, 不会把服务端的网络、输入、GUI部分带进去
+_capture_local = threading.local() # 每个截图线程私有的数据(缓存mss实例)
+MIN_VIEW_SIZE = 16 # 客户端回报的窗口尺寸下限(像素)
+CHANGE_SAMPLE_STEP = 8 # 画面变化检测每隔多少像素取一个采样点
+CHANGE_PIXEL_THRESHOLD = 8 # 采样点任一颜色通道变化超过该值才算变化,过滤编码噪声
+_last_sample = None # 上一次截图的采样点,所有截图线程共用(屏幕只有一块)
+_sample_lock = threading.Lock()
+# 截图转换、缩放、变化检测用的数组都从缓冲池取,用完放回;分辨率不变时稳态下每帧只剩mss内部的截图数据和JPEG输出两次分配
+capture_buffers = frame_pool.FramePool()
+
+
+def capture_screen():
+    """捕获主显示器屏幕(使用mss库),返回从capture_buffers取出的数组,调用方用完后放回"""
+    # mss实例不能跨线程使用,每个截图线程第一次调用时创建并缓存,避免每帧重新创建
+    sct = getattr(_capture_local, "sct", None)
+    if sct is None:
+        sct = _capture_local.sct = mss.mss()
+    sct_img = sct.grab(sct.monitors[1]) # monitors[1]是主显示器,monitors[0]是全屏幕
+    # 直接在mss的截图数据上建数组视图(不复制),形状为(height, width, channels)
+    img = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+    frame = capture_buffers.acquire((sct_img.height, sct_img.width, 3))
+    cv2.cvtColor(img, cv2.COLOR_RGBA2RGB, dst=frame) # 去掉alpha通道,结果写进复用的数组
+    return frame
+
+
+def screen_change(frame):
+    """与上一次截图相比,变化的采样点所占比例(0~1);只比较稀疏的采样点,1080p每帧约3万个点,耗时远小于编码"""
+    global _last_sample
+    view = frame[::CHANGE_SAMPLE_STEP, ::CHANGE_SAMPLE_STEP]
+    sample = capture_buffers.acquire(view.shape)
+    np.copyto(sample, view)
+    with _sample_lock: # 两个截图线程可能同时调用,上一次的采样点比较完才能放回缓冲池
+        previous, _last_sample = _last_sample, sample
+        if previous is None or previous.shape != sample.shape: # 第一帧或分辨率变化,按全部变化处理
+            if previous is not None:
+                capture_buffers.release(previous)
+            return 1.0
+        diff = capture_buffers.acquire(sample.shape)
+        cv2.absdiff(sample, previous, dst=diff)
+        capture_buffers.release(previous)
+        changed = capture_buffers.acquire(sample.shape[:2])
+        np.max(diff, axis=2, out=changed) # 三个颜色通道中变化最大的
+        capture_buffers.release(diff)
+        cv2.threshold(changed, CHANGE_PIXEL_THRESHOLD, 1, cv2.THRESH_BINARY, dst=changed)
+        ratio = cv2.countNonZero(changed) / changed.size
+        capture_buffers.release(changed)
+    return ratio
+
+
+def target_frame_size(src_width, src_height, max_width, max_height, view_size=None):
+    """计算编码分辨率：保持屏幕宽高比,不超过画质档位,也不超过客户端窗口,不放大"""
+    scale = min(1.0, max_width / src_width, max_height / src_height)
+    if view_size:
+        view_width, view_height = max(MIN_VIEW_SIZE, view_size[0]), max(MIN_VIEW_SIZE, view_size[1])
+        scale = min(scale, view_width / src_width, view_height / src_height)
+    return max(1, int(src_width * scale)), max(1, int(src_height * scale))
+
+
+def encode_captured(frame, width, height, quality, view_size=None):
+    """把截取的一帧缩放到目标尺寸并编码为JPEG,返回JPEG数据(直接引用编码输出的memoryview,不再复制成bytes)"""
+    target_size = target_frame_size(frame.shape[1], frame.shape[0], width, height, view_size)
+    resized = None
+    if (frame.shape[1], frame.shape[0]) != target_size: # 与原始分辨率不同时才缩放
+        resized = capture_buffers.acquire((target_size[1], target_size[0], 3))
+        cv2.resize(frame, target_size, dst=resized, interpolation=cv2.INTER_AREA) # 缩小时INTER_AREA更清晰
+        frame = resized
+    _, img_encoded = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if resized is not None:
+        capture_buffers.release(resized)
+    return img_encoded.reshape(-1).data # imencode输出形状为(N, 1),展平后才能按字节切片和写入共享内存
+
+
+def grab_and_encode(width, height, quality, view_size=None):
+    """在截图线程中完成截图、缩放和JPEG编码,返回(JPEG数据, 截图耗时ms, 处理耗时ms, 画面变化比例)
+    width/height是画质档位给出的上限,view_size是客户端窗口尺寸(未回报时为None)"""
+    # 1. 屏幕捕获阶段
+    capture_start = time.time()
+    frame = capture_screen()
+    capture_time = (time.time() - capture_start) * 1000 # 转换为毫秒
+
+    # 2. 分辨率缩放与JPEG编码阶段
+    process_start = time.time()
+    try:
+        change = screen_change(frame) # 在缩放前比较,不受画质档位切换影响
+        data = encode_captured(frame, width, height, quality, view_size)
+    finally:
+        capture_buffers.release(frame)
+    process_time = (time.time() - process_start) * 1000 # 缩放+编码耗时
+    return data, capture_time, process_time, change
+# ================= 屏幕捕捉部分 =================
+
+
+# ================= 共享内存帧环部分 =================
+# 截图进程把编码好的JPEG写进共享内存, 服务端进程直接从共享内存复制出来, 帧数据不经过pickle
+# 每个槽 = 24字节头 + JPEG数据, 头部: 帧序号(8字节) 数据长度(4字节) 截图耗时ms、处理耗时ms、画面变化比例(各4字节float)
+RING_SLOTS = 8 # 默认槽数; 服务端按视频连接数上限加RING_SPARE_SLOTS创建, 同时在编码的帧(每个视频连接最多一帧)不会互相覆盖
+RING_SPARE_SLOTS = 2 # 槽数比视频连接数上限多留的余量
+RING_SLOT_SIZE = 8 * 1024 * 1024 # 每槽8MB, 4K画面最高画质的JPEG也放得下
+SLOT_HEADER = struct.Struct("<QIfff")
+
+
+class FrameRing:
+    """按帧序号取模分槽的共享内存环, name为None时创建, 否则按名字打开已有的"""
+
+    def __init__(self, name=None, slots=RING_SLOTS, slot_size=RING_SLOT_SIZE):
+        self.slots = slots
+        self.slot_size = slot_size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+    def write(self, seq, data, capture_time, process_time, change):
+        """写入一帧, 超过槽容量时返回False
+        先把头部序号清零再写数据、最后写头: 读端复制前后两次看到的序号都对上时数据一定完整(顺序锁)"""
+        if len(data) > self.slot_size - SLOT_HEADER.size:
+            return False
+        offset = (seq % self.slots) * self.slot_size
+        struct.pack_into("<Q", self.shm.buf, offset, 0) # 帧序号从1开始, 0表示槽正在写入
+        start = offset + SLOT_HEADER.size
+        self.shm.buf[start:start + len(data)] = data
+        SLOT_HEADER.pack_into(self.shm.buf, offset, seq, len(data), capture_time, process_time, change)
+        return True
+
+    def read(self, seq):
+        """复制出序号为seq的帧, 返回与grab_and_encode()相同的元组
+        槽已被后面的帧覆盖, 或复制期间截图进程绕环一圈开始改写该槽(复制出的数据可能混了两帧)时返回None"""
+        offset = (seq % self.slots) * self.slot_size
+        slot_seq, length, capture_time, process_time, change = SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        if slot_seq != seq:
+            return None
+        start = offset + SLOT_HEADER.size
+        data = bytes(self.shm.buf[start:start + length])
+        if SLOT_HEADER.unpack_from(self.shm.buf, offset)[0] != seq: # 复制后再核对一次序号
+            return None
+        return data, capture_time, process_time, change
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+# ================= 共享内存帧环部分 =================
+
+
+# ================= 截图进程部分 =================
+def capture_worker_main(ring_name, slots, slot_size, requests, results):
+    """截图进程主循环: 按请求截图编码, 结果写入共享内存帧环, 再经结果队列通知帧序号"""
+    ring = FrameRing(ring_name, slots, slot_size)
+    try:
+        while True:
+            request = requests.get()
+            if request is None: # 服务端要求退出
+                break
+            seq, width, height, quality, view_size = request
+            try:
+                frame = grab_and_encode(width, height, quality, view_size)
+            except Exception as e:
+                results.put((seq, "error", str(e)))
+                continue
+            if ring.write(seq, *frame):
+                results.put((seq, "ring", None))
+            else: # 极少见的超大帧放不进槽, 退回经结果队列传输(memoryview不能pickle, 复制成bytes)
+                results.put((seq, "inline", (bytes(frame[0]),) + frame[1:]))
+    except KeyboardInterrupt: # Ctrl+C同时发给了子进程, 由服务端负责关闭
+        pass
+    finally:
+        ring.close()
+
+
+class CaptureProcess:
+    """服务端进程里的截图进程代理: submit()发出请求并返回Future, 收集线程从帧环取出结果
+    截图、转换、缩放、编码都在独立进程中执行, 不再和事件循环、输入注入线程争抢GIL"""
+
+    def __init__(self, slots=RING_SLOTS, slot_size=RING_SLOT_SIZE):
+        context = multiprocessing.get_context("spawn") # Windows只支持spawn, 其他平台也用它保持行为一致
+        self.ring = FrameRing(None, slots, slot_size)
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.process = context.Process(target=capture_worker_main, name="capture",
+                                       args=(self.ring.name, slots, slot_size, self.requests, self.results),
+                                       daemon=True)
+        self.process.start()
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.pending = {} # 帧序号 -> 等待结果的Future
+        self.closed = False
+        self.collector = threading.Thread(target=self._collect, name="capture-results", daemon=True)
+        self.collector.start()
+
+    def is_alive(self):
+        return not self.closed and self.process.is_alive()
+
+    def submit(self, width, height, quality, view_size=None):
+        """请求截取并编码一帧, Future的结果与grab_and_encode()相同"""
+        future = Future()
+        with self.lock:
+            if not self.is_alive():
+                future.set_exception(RuntimeError("截图进程已退出"))
+                return future
+            self.seq += 1
+            self.pending[self.seq] = future
+            self.requests.put((self.seq, width, height, quality, view_size))
+        return future
+
+    def _collect(self):
+        while not self.closed:
+            try:
+                seq, kind, payload = self.results.get(timeout=1.0)
+            except queue.Empty:
+                if not self.process.is_alive(): # 截图进程崩溃, 让所有等待者失败而不是永远卡住
+                    break
+                continue
+            except (EOFError, OSError):
+                break
+            with self.lock:
+                future = self.pending.pop(seq, None)
+            # 等待的推流协程已被取消(如视频连接被新连接接管)时Future也已取消, 不能再设置结果
+            if future is None or not future.set_running_or_notify_cancel():
+                continue
+            if kind == "ring":
+                frame = self.ring.read(seq)
+                if frame is None:
+                    future.set_exception(RuntimeError(f"帧 {seq} 在读取前已被覆盖"))
+                else:
+                    future.set_result(frame)
+            elif kind == "inline":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"截图进程出错: {payload}"))
+        self._fail_pending()
+
+    def _fail_pending(self):
+        with self.lock:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("截图进程已退出"))
+
+    def close(self, timeout=2.0):
+        """通知截图进程退出并释放共享内存"""
+        self.requests.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.closed = True
+        self.collector.join(timeout)
+        self._fail_pending()
+        self.ring.close(unlink=True)
+# ================= 截图进程部分 =================
+
+
+if __name__ == "__main__":
+    # python capture_process.py bench [帧数]: 对比线程内编码和截图进程编码的吞吐
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        frame_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+        start = time.perf_counter()
+        for _ in range(frame_count):
+            grab_and_encode(1920, 1080, 80)
+        local_fps = frame_count / (time.perf_counter() - start)
+        worker = CaptureProcess()
+        try:
+            worker.submit(1920, 1080, 80).result() # 预热, 不计入进程启动时间
+            start = time.perf_counter()
+            for _ in range(frame_count):
+                worker.submit(1920, 1080, 80).result()
+            process_fps = frame_count / (time.perf_counter() - start)
+        finally:
+            worker.close()
+        print(f"本进程编码: {local_fps:.1f} 帧/秒, 截图进程编码(含共享内存复制): {process_fps:.1f} 帧/秒")
+    # python capture_process.py alloc [帧数]: 用tracemalloc测量稳态时每帧的瞬时内存分配, 缩放+编码超出上限时返回码为1
+    elif len(sys.argv) >= 2 and sys.argv[1] == "alloc":
+        frame_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+        alloc_limit = 64 * 1024 # 缩放+编码阶段除JPEG输出外允许的分配(字节)
+        capture_bytes = frame_pool.measure_allocations(lambda: capture_buffers.release(capture_screen()), frame_count)
+        frame = capture_screen()
+        screen_bytes = frame.shape[0] * frame.shape[1] * 4
+        change_bytes = frame_pool.measure_allocations(lambda: screen_change(frame), frame_count)
+        output_size = len(encode_captured(frame, 1280, 720, 80))
+        encode_bytes = frame_pool.measure_allocations(lambda: encode_captured(frame, 1280, 720, 80), frame_count)
+        print(f"截图: {capture_bytes / 1024:.0f}KB/帧 (其中mss内部的截图数据 {screen_bytes / 1024:.0f}KB)")
+        print(f"变化检测: {change_bytes / 1024:.1f}KB/帧")
+        print(f"缩放+编码: {encode_bytes / 1024:.1f}KB/帧 (其中JPEG输出 {output_size / 1024:.0f}KB)")
+        print(f"缓冲池: 新分配 {capture_buffers.allocated} 次, 复用 {capture_buffers.reused} 次")
+        if change_bytes + encode_bytes - output_size > alloc_limit:
+            print(f"稳态分配超过 {alloc_limit // 1024}KB/帧")
+            sys.exit(1)
+    else:
+        print("用法: python capture_process.py bench [帧数] | alloc [帧数]")
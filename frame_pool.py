@@ -0,0 +1,69 @@
+import threading
+import tracemalloc
+import numpy as np
+
+
+# ================= 帧缓冲池 =================
+# 截图转换、缩放、接收缓冲每帧都要几MB的数组, 每帧重新分配会产生大量短命的大块内存
+# FramePool按(形状, 类型)保存用完的数组, 下一帧同尺寸时直接复用, 分辨率不变时稳态下不再分配
+MAX_PER_SHAPE = 4 # 每种形状最多保留几块空闲缓冲, 同时在用的帧不超过截图线程数+几帧
+
+
+class FramePool:
+    """固定形状的NumPy缓冲池: acquire()取一块(没有空闲的才新分配), 用完release()放回
+    取出的缓冲内容是上一次使用留下的, 调用方必须整块覆盖写入; 多线程共用, 操作都在锁内"""
+
+    def __init__(self, max_per_shape=MAX_PER_SHAPE):
+        self.lock = threading.Lock()
+        self.free = {} # (形状, 类型) -> 空闲缓冲列表
+        self.max_per_shape = max_per_shape
+        self.allocated = 0 # 新分配的次数
+        self.reused = 0 # 复用的次数
+
+    @staticmethod
+    def _key(shape, dtype):
+        return tuple(shape), np.dtype(dtype).str
+
+    def acquire(self, shape, dtype=np.uint8):
+        with self.lock:
+            buffers = self.free.get(self._key(shape, dtype))
+            if buffers:
+                self.reused += 1
+                return buffers.pop()
+            self.allocated += 1
+        return np.empty(shape, dtype)
+
+    def release(self, buffer):
+        """放回一块缓冲; 分辨率变化后旧尺寸的缓冲用不上, 每种形状超过上限的直接丢弃"""
+        with self.lock:
+            buffers = self.free.setdefault(self._key(buffer.shape, buffer.dtype), [])
+            if len(buffers) < self.max_per_shape:
+                buffers.append(buffer)
+
+    def clear(self):
+        with self.lock:
+            self.free.clear()
+# ================= 帧缓冲池 =================
+
+
+# ================= 稳态内存分配测量 =================
+def measure_allocations(step, frames=100, warmup=20):
+    """用tracemalloc测量step()在稳态下每次调用的瞬时内存分配峰值(字节), 返回各次的平均值
+    先调用warmup次让缓冲池填满再开始统计; step()的返回值随即释放, 它的大小也计入峰值, 调用方可自行扣除"""
+    for _ in range(warmup):
+        step()
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            step()
+            total += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return total / frames
+# ================= 稳态内存分配测量 =================
@@ -0,0 +1,364 @@
+import sys
+import time
+import ctypes
+import threading
+
+
+# ================= 输入注入后端 =================
+# 服务端把鼠标键盘事件交给一个注入后端执行, 所有后端都是瞬时绝对定位, 没有pyautogui的补间动画:
+#   pyautogui - 用pyautogui/keyboard库注入, 任何平台都能用
+#   native    - Windows用SendInput, Linux(X11)用XTest, 直接调系统接口, 每个事件只有几微秒
+#   null      - 只记录事件不注入, 用于测试和压测
+# 键名使用keyboard库的命名(如'enter'、'esc'、'shift'、'a')
+
+class InputBackend:
+    """注入后端接口, 坐标都是屏幕绝对像素坐标"""
+
+    name = "base"
+
+    def screen_size(self):
+        raise NotImplementedError
+
+    def position(self):
+        raise NotImplementedError
+
+    def move(self, x, y):
+        raise NotImplementedError
+
+    def button(self, button, down):
+        """按下或松开鼠标按键, button为'left'/'right'/'middle'"""
+        raise NotImplementedError
+
+    def click(self, button="left", clicks=1):
+        for _ in range(clicks):
+            self.button(button, True)
+            self.button(button, False)
+
+    def scroll(self, delta):
+        raise NotImplementedError
+
+    def hscroll(self, delta):
+        raise NotImplementedError
+
+    def key(self, name, down):
+        raise NotImplementedError
+
+
+class PyAutoGuiBackend(InputBackend):
+    """pyautogui注入鼠标、keyboard库注入键盘, moveTo不带duration, 瞬间到位"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        import keyboard
+        self.pyautogui = pyautogui
+        self.keyboard = keyboard
+        pyautogui.PAUSE = 0.0  # 关闭pyautogui每个操作后的默认延迟
+        pyautogui.FAILSAFE = True  # 鼠标移到左上角时停止操作
+
+    def screen_size(self):
+        return tuple(self.pyautogui.size())
+
+    def position(self):
+        return tuple(self.pyautogui.position())
+
+    def move(self, x, y):
+        self.pyautogui.moveTo(x, y)
+
+    def button(self, button, down):
+        if down:
+            self.pyautogui.mouseDown(button=button)
+        else:
+            self.pyautogui.mouseUp(button=button)
+
+    def click(self, button="left", clicks=1):
+        self.pyautogui.click(button=button, clicks=clicks, interval=0.0)
+
+    def scroll(self, delta):
+        self.pyautogui.scroll(delta)
+
+    def hscroll(self, delta):
+        self.pyautogui.hscroll(delta)
+
+    def key(self, name, down):
+        if down:
+            self.keyboard.press(name)
+        else:
+            self.keyboard.release(name)
+
+
+class RecordingBackend(InputBackend):
+    """不注入任何输入, 只把事件记录到events列表 [(时间, 操作, 参数...)]"""
+
+    name = "null"
+
+    def __init__(self, screen=(1920, 1080), keep=True):
+        self.screen = screen
+        self.keep = keep  # 压测时不保留记录, 避免内存增长
+        self.events = []
+        self.count = 0
+        self.cursor = (0, 0)
+        self.lock = threading.Lock()
+
+    def _record(self, *event):
+        with self.lock:
+            self.count += 1
+            if self.keep:
+                self.events.append((time.time(),) + event)
+
+    def screen_size(self):
+        return self.screen
+
+    def position(self):
+        return self.cursor
+
+    def move(self, x, y):
+        self.cursor = (x, y)
+        self._record("move", x, y)
+
+    def button(self, button, down):
+        self._record("button", button, down)
+
+    def scroll(self, delta):
+        self._record("scroll", delta)
+
+    def hscroll(self, delta):
+        self._record("hscroll", delta)
+
+    def key(self, name, down):
+        self._record("key", name, down)
+# ================= 输入注入后端 =================
+
+
+# ================= Windows SendInput =================
+INPUT_MOUSE = 0
+MOUSEEVENTF_MOVE = 0x0001
+MOUSEEVENTF_ABSOLUTE = 0x8000
+MOUSEEVENTF_WHEEL = 0x0800
+MOUSEEVENTF_HWHEEL = 0x1000
+MOUSE_BUTTON_FLAGS = {  # 按键 -> (按下标志, 松开标志)
+    "left": (0x0002, 0x0004),
+    "right": (0x0008, 0x0010),
+    "middle": (0x0020, 0x0040),
+}
+
+
+class _MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", ctypes.c_long), ("dy", ctypes.c_long), ("mouseData", ctypes.c_ulong),
+                ("dwFlags", ctypes.c_ulong), ("time", ctypes.c_ulong), ("dwExtraInfo", ctypes.c_size_t)]
+
+
+class _KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", ctypes.c_ushort), ("wScan", ctypes.c_ushort), ("dwFlags", ctypes.c_ulong),
+                ("time", ctypes.c_ulong), ("dwExtraInfo", ctypes.c_size_t)]
+
+
+class _INPUTUNION(ctypes.Union):
+    _fields_ = [("mi", _MOUSEINPUT), ("ki", _KEYBDINPUT)]  # 联合体大小要与系统的INPUT一致
+
+
+class _INPUT(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_ulong), ("union", _INPUTUNION)]
+
+
+class _POINT(ctypes.Structure):
+    _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+
+
+class SendInputBackend(InputBackend):
+    """Windows原生注入: 鼠标直接调用SendInput; 键盘交给keyboard库, 它在Windows上本身就是原生注入"""
+
+    name = "native"
+
+    def __init__(self):
+        self.keyboard = None  # 第一次注入按键时才导入keyboard库, 不拖慢服务端启动
+        self.user32 = ctypes.windll.user32
+        self.user32.SetProcessDPIAware()  # 按物理像素取屏幕尺寸, 与截图分辨率一致
+
+    def _send_mouse(self, flags, dx=0, dy=0, data=0):
+        mouse_input = _INPUT(type=INPUT_MOUSE)
+        mouse_input.union.mi = _MOUSEINPUT(dx, dy, data & 0xFFFFFFFF, flags, 0, 0)
+        self.user32.SendInput(1, ctypes.byref(mouse_input), ctypes.sizeof(_INPUT))
+
+    def screen_size(self):
+        return self.user32.GetSystemMetrics(0), self.user32.GetSystemMetrics(1)
+
+    def position(self):
+        point = _POINT()
+        self.user32.GetCursorPos(ctypes.byref(point))
+        return point.x, point.y
+
+    def move(self, x, y):
+        # 绝对坐标归一化到0-65535
+        width, height = self.screen_size()
+        dx = x * 65535 // max(1, width - 1)
+        dy = y * 65535 // max(1, height - 1)
+        self._send_mouse(MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE, dx, dy)
+
+    def button(self, button, down):
+        down_flag, up_flag = MOUSE_BUTTON_FLAGS[button]
+        self._send_mouse(down_flag if down else up_flag)
+
+    def scroll(self, delta):
+        self._send_mouse(MOUSEEVENTF_WHEEL, data=delta)
+
+    def hscroll(self, delta):
+        self._send_mouse(MOUSEEVENTF_HWHEEL, data=delta)
+
+    def key(self, name, down):
+        if self.keyboard is None:
+            import keyboard
+            self.keyboard = keyboard
+        if down:
+            self.keyboard.press(name)
+        else:
+            self.keyboard.release(name)
+# ================= Windows SendInput =================
+
+
+# ================= Linux XTest =================
+# keyboard库键名 -> X11 keysym名称, 单个字符直接用字符本身
+X11_KEYSYMS = {
+    " ": "space", "space": "space", "enter": "Return", "backspace": "BackSpace", "delete": "Delete",
+    "tab": "Tab", "esc": "Escape", "up": "Up", "down": "Down", "left": "Left", "right": "Right",
+    "shift": "Shift_L", "ctrl": "Control_L", "alt": "Alt_L", "caps_lock": "Caps_Lock",
+    "home": "Home", "end": "End", "page up": "Prior", "page down": "Next", "insert": "Insert",
+}
+X11_BUTTONS = {"left": 1, "middle": 2, "right": 3}
+X11_WHEEL_STEP = 100  # 与pyautogui一致, scroll(100)约等于滚动一格
+
+
+class XTestBackend(InputBackend):
+    """Linux(X11)原生注入: 通过ctypes调用libXtst的XTestFake*事件, 不依赖额外的Python包"""
+
+    name = "native"
+
+    def __init__(self):
+        self.xlib = ctypes.cdll.LoadLibrary("libX11.so.6")
+        self.xtst = ctypes.cdll.LoadLibrary("libXtst.so.6")
+        self.xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self.xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        self.xlib.XStringToKeysym.restype = ctypes.c_ulong
+        self.xlib.XInitThreads()  # 注入可能来自多个线程
+        self.display = ctypes.c_void_p(self.xlib.XOpenDisplay(None))
+        if not self.display:
+            raise OSError("无法连接X11显示服务")
+        self.lock = threading.Lock()
+
+    def _flush(self):
+        self.xlib.XFlush(self.display)
+
+    def screen_size(self):
+        screen = self.xlib.XDefaultScreen(self.display)
+        return self.xlib.XDisplayWidth(self.display, screen), self.xlib.XDisplayHeight(self.display, screen)
+
+    def position(self):
+        root = ctypes.c_ulong(self.xlib.XDefaultRootWindow(self.display))
+        child = ctypes.c_ulong()
+        root_x, root_y, win_x, win_y = (ctypes.c_int() for _ in range(4))
+        mask = ctypes.c_uint()
+        with self.lock:
+            self.xlib.XQueryPointer(self.display, root, ctypes.byref(ctypes.c_ulong()), ctypes.byref(child),
+                                    ctypes.byref(root_x), ctypes.byref(root_y),
+                                    ctypes.byref(win_x), ctypes.byref(win_y), ctypes.byref(mask))
+        return root_x.value, root_y.value
+
+    def move(self, x, y):
+        with self.lock:
+            self.xtst.XTestFakeMotionEvent(self.display, -1, int(x), int(y), 0)
+            self._flush()
+
+    def _button(self, number, down):
+        self.xtst.XTestFakeButtonEvent(self.display, number, bool(down), 0)
+
+    def button(self, button, down):
+        with self.lock:
+            self._button(X11_BUTTONS[button], down)
+            self._flush()
+
+    def scroll(self, delta):
+        self._wheel(4 if delta > 0 else 5, delta)
+
+    def hscroll(self, delta):
+        self._wheel(7 if delta > 0 else 6, delta)
+
+    def _wheel(self, number, delta):
+        # X11的滚轮是按键4/5(垂直)、6/7(水平), 每次按下松开滚动一格
+        with self.lock:
+            for _ in range(max(1, abs(delta) // X11_WHEEL_STEP)):
+                self._button(number, True)
+                self._button(number, False)
+            self._flush()
+
+    def key(self, name, down):
+        keysym = self.xlib.XStringToKeysym(X11_KEYSYMS.get(name, name).encode("utf-8"))
+        if not keysym and len(name) > 1:  # 功能键: f1 -> F1
+            keysym = self.xlib.XStringToKeysym(name.upper().encode("utf-8"))
+        keycode = self.xlib.XKeysymToKeycode(self.display, ctypes.c_ulong(keysym))
+        if not keycode:
+            raise ValueError(f"无法识别的按键: {name}")
+        with self.lock:
+            self.xtst.XTestFakeKeyEvent(self.display, keycode, bool(down), 0)
+            self._flush()
+# ================= Linux XTest =================
+
+
+# ================= 后端选择 =================
+BACKENDS = ("auto", "native", "pyautogui", "null")
+
+
+def create_backend(name="auto"):
+    """按名称创建注入后端; auto优先用原生后端, 不可用时退回pyautogui"""
+    if name == "null":
+        return RecordingBackend(keep=False)
+    if name == "pyautogui":
+        return PyAutoGuiBackend()
+    if name in ("native", "auto"):
+        try:
+            if sys.platform == "win32":
+                return SendInputBackend()
+            if sys.platform.startswith("linux"):
+                return XTestBackend()
+            raise OSError(f"{sys.platform} 没有原生注入后端")
+        except (OSError, AttributeError, ImportError) as e:
+            if name == "native":
+                raise
+            print(f"原生注入后端不可用({e}), 使用pyautogui")
+            return PyAutoGuiBackend()
+    raise ValueError(f"未知的注入后端: {name}, 可选 {', '.join(BACKENDS)}")
+# ================= 后端选择 =================
+
+
+# ================= 注入基准测试 =================
+def benchmark(backend, count=2000):
+    """连续注入count个鼠标移动事件, 返回(每秒事件数, 单个事件延迟中位数ms, P99延迟ms)
+    注意: 对真实后端运行会实际移动鼠标"""
+    width, height = backend.screen_size()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        x = width // 4 + (i * 7) % (width // 2)
+        y = height // 4 + (i * 5) % (height // 2)
+        event_start = time.perf_counter()
+        backend.move(x, y)
+        latencies.append(time.perf_counter() - event_start)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    rate = count / elapsed if elapsed > 0 else float("inf")
+    median = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"注入后端 {backend.name}: {count} 个移动事件, {rate:.0f} 个/秒, "
+          f"单个事件延迟 中位数 {median:.3f}ms P99 {p99:.3f}ms")
+    return rate, median, p99
+# ================= 注入基准测试 =================
+
+
+if __name__ == "__main__":
+    # python input_backend.py bench [auto|native|pyautogui|null] [事件数]
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        backend_name = sys.argv[2] if len(sys.argv) > 2 else "null"
+        event_count = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+        benchmark(create_backend(backend_name), event_count)
+    else:
+        print("用法: python input_backend.py bench [auto|native|pyautogui|null] [事件数]")
@@ -0,0 +1,314 @@
+import socket
+import json
+import time
+import random
+import threading
+import argparse
+import udp_video
+from collections import deque
+
+
+# ================= 模拟观看端 =================
+# 与tcp_client.py使用相同的协议(会话握手、视频帧、鼠标键盘指令), 但没有窗口、win32gui和键盘钩子,
+# 一台机器上可以同时开很多个, 用来测服务端能撑住多少观看端
+VIEW_SIZE = (1280, 720)      # 默认回报的窗口尺寸
+LATENCY_TOLERANCE = 0.002    # 服务端回报的光标位置与目标相差不超过0.2%即认为已到达
+MOVE_HISTORY = 256           # 最多记住多少个还没等到光标回报的移动目标
+MOVE_EXPIRY = 2.0            # 移动目标这么久还没等到回报就不再计入延迟(秒)
+PING_INTERVAL = 2.0          # 与tcp_client相同每2秒发一次ping, 服务端鼠标通道长时间收不到数据会断开
+
+
+def recv_exact(sock, size):
+    """从TCP连接读取恰好size字节, 连接关闭时返回None"""
+    data = bytearray()
+    while len(data) < size:
+        packet = sock.recv(size - len(data))
+        if not packet:
+            return None
+        data += packet
+    return bytes(data)
+
+
+def send_line(sock, message):
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+class SimulatedViewer:
+    """一个无界面的观看端: 接收视频帧(解码后丢弃或只计数), 按设定速率发送合成的鼠标和键盘事件"""
+
+    def __init__(self, viewer_id, host, port, decode=False, use_udp=False, view_size=VIEW_SIZE,
+                 mouse_rate=0.0, key_rate=0.0, key_name="shift", allow_idle=False):
+        self.viewer_id = viewer_id
+        self.host = host
+        self.port = port
+        self.decode = decode
+        self.use_udp = use_udp
+        self.view_size = view_size
+        self.mouse_rate = mouse_rate  # 每秒鼠标移动事件数
+        self.key_rate = key_rate  # 每秒按键次数(按下+松开算一次)
+        self.key_name = key_name
+        self.allow_idle = allow_idle  # 默认在握手中关闭空闲降帧, 不发输入的观看端也按满帧率测量
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.bytes = 0
+        self.decode_ms = 0.0
+        self.mouse_events = 0
+        self.key_events = 0
+        self.latencies = []  # 鼠标移动到服务端回报光标到位的耗时(秒)
+        self.sent_moves = deque(maxlen=MOVE_HISTORY)  # 已发送、尚未等到光标回报的(目标x, 目标y, 发送时间), 从旧到新
+        self.server_stats = None  # 服务端最近一次回报的画质统计
+        self.error = None
+        self.sockets = []
+        self.video_udp = None
+        self.mouse_lock = threading.Lock()  # 鼠标移动和ping在不同线程发送, 整行发送不能交错
+
+    # ---------- 连接 ----------
+    def connect(self):
+        mouse = socket.create_connection((self.host, self.port + 1), timeout=10)
+        mouse.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sockets.append(mouse)
+        send_line(mouse, {"type": "hello", "session": None, "idle": self.allow_idle})
+        stream = mouse.makefile("rb")
+        reply = json.loads(stream.readline())
+        if reply.get("type") == "error":  # 服务端连接数或会话数已满
+            raise ConnectionRefusedError(reply.get("message"))
+        token = reply["token"]
+        mouse.settimeout(None)
+        self.mouse = mouse
+        self.control_stream = stream
+
+        peer = mouse.getpeername()
+        if self.use_udp:
+            self.video_udp = udp_video.UdpVideoClient(peer[0], self.port, mouse.family, token=token)
+            self.video_udp.send_view_size(*self.view_size)
+        else:
+            video = socket.create_connection((peer[0], self.port), timeout=10)
+            self.sockets.append(video)
+            send_line(video, {"type": "hello", "session": token})
+            send_line(video, {"type": "view_size", "width": self.view_size[0], "height": self.view_size[1]})
+            video.settimeout(None)
+            self.video = video
+
+        keyboard = socket.create_connection((peer[0], self.port + 2), timeout=10)
+        keyboard.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sockets.append(keyboard)
+        send_line(keyboard, {"type": "hello", "session": token})
+        reply = json.loads(keyboard.makefile("rb").readline() or b"{}")
+        if reply.get("type") != "ready":  # 服务端键盘连接已满
+            raise ConnectionRefusedError(reply.get("message", "键盘通道握手失败"))
+        keyboard.settimeout(None)
+        self.keyboard = keyboard
+
+    def start(self):
+        self.connect()
+        targets = [self._receive_video, self._receive_control, self._send_pings]
+        if self.mouse_rate > 0:
+            targets.append(self._generate_mouse)
+        if self.key_rate > 0:
+            targets.append(self._generate_keys)
+        for target in targets:
+            threading.Thread(target=target, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        for sock in self.sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        if self.video_udp:
+            self.video_udp.close()
+
+    # ---------- 接收 ----------
+    def _receive_video(self):
+        if self.decode:  # 只有解码模式才需要OpenCV
+            import cv2
+            import numpy as np
+        try:
+            while not self.stop_event.is_set():
+                if self.video_udp:
+                    data = self.video_udp.recv_frame()
+                else:
+                    size_data = recv_exact(self.video, 4)
+                    data = recv_exact(self.video, int.from_bytes(size_data, "big")) if size_data else None
+                if not data:
+                    break
+                decode_ms = 0.0
+                if self.decode:
+                    decode_start = time.time()
+                    cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                    decode_ms = (time.time() - decode_start) * 1000
+                with self.lock:
+                    self.frames += 1
+                    self.bytes += len(data)
+                    self.decode_ms += decode_ms
+        except OSError as e:
+            if not self.stop_event.is_set():
+                self.error = e
+
+    def _receive_control(self):
+        """读取服务端回报的光标位置(用来测输入延迟)和画质统计(含服务端CPU)"""
+        try:
+            for line in self.control_stream:
+                message = json.loads(line)
+                if message.get("type") == "cursor":
+                    self._match_cursor(message["x"], message["y"])
+                elif message.get("type") == "video_stats":
+                    self.server_stats = message
+        except (OSError, ValueError):
+            pass
+
+    def _match_cursor(self, x, y):
+        """光标回报按最新的一个相符目标计算延迟; 服务端每50ms才回报一次, 排队的移动还会被合并,
+        所以中间的目标可能永远等不到回报, 比它更早的目标一并丢弃"""
+        now = time.time()
+        with self.lock:
+            while self.sent_moves and now - self.sent_moves[0][2] > MOVE_EXPIRY:
+                self.sent_moves.popleft()
+            for i in range(len(self.sent_moves) - 1, -1, -1):
+                target_x, target_y, sent_time = self.sent_moves[i]
+                if abs(x - target_x) <= LATENCY_TOLERANCE and abs(y - target_y) <= LATENCY_TOLERANCE:
+                    self.latencies.append(now - sent_time)
+                    for _ in range(i + 1):
+                        self.sent_moves.popleft()
+                    return
+
+    # ---------- 合成输入 ----------
+    def _send_mouse(self, message):
+        with self.mouse_lock:
+            send_line(self.mouse, message)
+
+    def _send_pings(self):
+        """定期ping, 没有合成输入的观看端也不会被服务端当作失联断开"""
+        try:
+            while not self.stop_event.wait(PING_INTERVAL):
+                self._send_mouse({"type": "ping", "t0": time.time()})
+        except OSError:
+            pass
+
+    def _generate_mouse(self):
+        interval = 1.0 / self.mouse_rate
+        rng = random.Random(self.viewer_id)
+        try:
+            while not self.stop_event.wait(interval):
+                x, y = rng.uniform(0.2, 0.8), rng.uniform(0.2, 0.8)
+                with self.lock:
+                    self.sent_moves.append((x, y, time.time()))
+                self._send_mouse({"type": "move", "x": x, "y": y, "is_down": False})
+                self.mouse_events += 1
+        except OSError:
+            pass
+
+    def _generate_keys(self):
+        interval = 1.0 / self.key_rate
+        try:
+            while not self.stop_event.wait(interval):
+                send_line(self.keyboard, {"type": "key_down", "name": self.key_name, "time": time.time()})
+                send_line(self.keyboard, {"type": "key_up", "name": self.key_name, "time": time.time()})
+                self.key_events += 1
+        except OSError:
+            pass
+
+    # ---------- 统计 ----------
+    def take_stats(self):
+        """取出并清零本统计周期的计数"""
+        with self.lock:
+            stats = (self.frames, self.bytes, self.decode_ms, self.latencies)
+            self.frames = self.bytes = 0
+            self.decode_ms = 0.0
+            self.latencies = []
+        return stats
+# ================= 模拟观看端 =================
+
+
+# ================= 压测主流程 =================
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_load_test(host, port, viewers, duration, interval=5.0, ramp=0.1, input_viewers=None, **viewer_options):
+    """启动viewers个模拟观看端, 运行duration秒, 每interval秒打印每个观看端的帧率、码率、延迟和服务端CPU
+    只有前input_viewers个观看端发送合成输入(默认全部); 服务端只有一个鼠标, 多个观看端同时移动会互相干扰延迟测量"""
+    if input_viewers is None:
+        input_viewers = viewers
+    started = []
+    for i in range(viewers):
+        options = dict(viewer_options)
+        if i >= input_viewers:
+            options.update(mouse_rate=0.0, key_rate=0.0)
+        try:
+            started.append(SimulatedViewer(i, host, port, **options).start())
+        except (OSError, ValueError, KeyError) as e:
+            print(f"观看端 {i} 连接失败: {e}")
+        time.sleep(ramp)  # 逐个连接, 避免瞬间挤满服务端的监听队列
+    print(f"已启动 {len(started)}/{viewers} 个观看端")
+
+    totals = {viewer.viewer_id: [0, 0] for viewer in started}  # 累计帧数和字节数
+    end_time = time.time() + duration
+    last_report = time.time()
+    try:
+        while time.time() < end_time and started:
+            time.sleep(min(interval, max(0.0, end_time - time.time())))
+            now = time.time()
+            elapsed = now - last_report
+            last_report = now
+
+            print(f"\n[压测 {time.strftime('%H:%M:%S')}] 观看端 {len(started)}")
+            all_fps = []
+            server_stats = None
+            for viewer in started:
+                frames, size, decode_ms, latencies = viewer.take_stats()
+                totals[viewer.viewer_id][0] += frames
+                totals[viewer.viewer_id][1] += size
+                fps = frames / elapsed
+                all_fps.append(fps)
+                latency = (f"输入延迟 平均{sum(latencies) / len(latencies) * 1000:.0f}ms "
+                           f"P95 {percentile(latencies, 0.95) * 1000:.0f}ms") if latencies else "输入延迟 --"
+                decode = f" 解码 {decode_ms / frames:.1f}ms" if viewer.decode and frames else ""
+                state = f" 已断开: {viewer.error}" if viewer.error else ""
+                if viewer.server_stats and viewer.server_stats.get("idle"):
+                    state += " (服务端空闲降帧)"
+                print(f"  #{viewer.viewer_id:<3} 帧率 {fps:5.1f} 码率 {size * 8 / elapsed / 1e6:6.2f}Mbps "
+                      f"累计 {totals[viewer.viewer_id][1] / 1e6:.1f}MB {latency}{decode}{state}")
+                server_stats = viewer.server_stats or server_stats
+            cpu = f"{server_stats['cpu']:.0f}%" if server_stats and "cpu" in server_stats else "--"
+            queue_age = f"{server_stats['input_age_ms']:.0f}ms" \
+                if server_stats and "input_age_ms" in server_stats else "--"
+            print(f"  合计帧率 {sum(all_fps):.1f} 最低 {min(all_fps):.1f} 服务端CPU {cpu} 输入最长排队 {queue_age}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for viewer in started:
+            viewer.stop()
+    return totals
+# ================= 压测主流程 =================
+
+
+if __name__ == "__main__":
+    # python load_test.py <服务器地址> -n 20 -t 60 [--decode] [--udp] [--mouse-rate 30] [--key-rate 2]
+    parser = argparse.ArgumentParser(description="无界面模拟多个观看端, 测试服务端的承载能力")
+    parser.add_argument("host", help="服务器地址(IPv4/IPv6/主机名)")
+    parser.add_argument("--port", type=int, default=8585, help="视频端口, 鼠标/键盘为其后两个端口")
+    parser.add_argument("-n", "--viewers", type=int, default=10, help="观看端数量")
+    parser.add_argument("-t", "--duration", type=float, default=60.0, help="运行时间(秒)")
+    parser.add_argument("--interval", type=float, default=5.0, help="统计输出间隔(秒)")
+    parser.add_argument("--decode", action="store_true", help="解码每一帧后丢弃(默认只计数不解码)")
+    parser.add_argument("--udp", action="store_true", help="视频走UDP传输")
+    parser.add_argument("--view", default=f"{VIEW_SIZE[0]}x{VIEW_SIZE[1]}", help="回报的窗口尺寸, 如1280x720")
+    parser.add_argument("--mouse-rate", type=float, default=0.0, help="每个观看端每秒发送的鼠标移动数")
+    parser.add_argument("--key-rate", type=float, default=0.0, help="每个观看端每秒的按键次数")
+    parser.add_argument("--key", default="shift", help="合成按键使用的键名")
+    parser.add_argument("--input-viewers", type=int, default=None,
+                        help="只让前几个观看端发送合成输入(默认全部), 测输入延迟时建议设为1")
+    parser.add_argument("--allow-idle", action="store_true",
+                        help="允许服务端对没有输入的观看端空闲降帧(默认关闭, 按满帧率测承载能力)")
+    args = parser.parse_args()
+
+    view_width, view_height = (int(v) for v in args.view.lower().split("x"))
+    run_load_test(args.host.strip("[]"), args.port, args.viewers, args.duration, args.interval,
+                  input_viewers=args.input_viewers, decode=args.decode, use_udp=args.udp, view_size=(view_width, view_height),
+                  mouse_rate=args.mouse_rate, key_rate=args.key_rate, key_name=args.key, allow_idle=args.allow_idle)
@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import ctypes
+import signal
+import threading
+from collections import Counter
+
+
+# ================= 采样分析器 =================
+# 运行中按需开启: 后台线程每隔SAMPLE_INTERVAL用sys._current_frames()抓一次所有线程的调用栈, 持续若干秒后写出
+#   <前缀>-<时间>.collapsed  折叠调用栈, 每行"线程;函数;函数... 次数", 可直接交给flamegraph.pl或speedscope生成火焰图
+#   <前缀>-<时间>.txt        每个线程的采样数和CPU时间
+# 被采样的线程不需要配合(不用sys.settrace), 不开启时没有任何开销, 可以留在正式版本里
+SAMPLE_INTERVAL = 0.005 # 采样间隔(秒), 每秒200次
+DEFAULT_DURATION = 10.0 # 默认采样时长(秒)
+MAX_DURATION = 300.0 # 采样时长上限(秒), 防止误输入后长时间占用
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+_active_lock = threading.Lock()
+_active = None # 正在进行的采样, 同一时刻只有一个
+
+
+def thread_cpu_time(thread):
+    """线程累计的CPU时间(秒), 线程已退出或系统不支持时返回None"""
+    if sys.platform == "win32":
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenThread(0x0800, False, thread.native_id) # THREAD_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return None
+        try:
+            times = [ctypes.c_ulonglong() for _ in range(4)] # 创建、退出、内核态、用户态时间(FILETIME, 100纳秒)
+            if not kernel32.GetThreadTimes(handle, *(ctypes.byref(t) for t in times)):
+                return None
+            return (times[2].value + times[3].value) / 1e7
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+    except (AttributeError, OSError): # 线程已退出, 或平台没有pthread_getcpuclockid
+        return None
+
+
+class SamplingProfiler:
+    """一次采样: start()后在后台线程中采样duration秒, 结束时写出文件, done事件被设置"""
+
+    def __init__(self, duration=DEFAULT_DURATION, prefix="profile", interval=SAMPLE_INTERVAL, output_dir=PROFILE_DIR):
+        self.duration = min(float(duration), MAX_DURATION)
+        self.interval = interval
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.output = os.path.join(output_dir, f"{prefix}-{stamp}") # 输出文件路径(不含扩展名)
+        self.stacks = Counter() # (线程名, 折叠调用栈) -> 采样次数
+        self.thread_samples = Counter() # 线程名 -> 采样次数
+        self.rounds = 0 # 采样轮数
+        self.summary = None # 结束后的每线程统计文本
+        self.error = None
+        self.done = threading.Event()
+        self._labels = {} # 代码对象 -> "函数 (文件:行)", 避免每次采样重新格式化
+
+    def start(self):
+        threading.Thread(target=self._run, name="profiler", daemon=True).start()
+        return self
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _collapse(self, frame):
+        """把一个线程当前的调用栈折叠成"外层;...;内层"的形式"""
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _run(self):
+        try:
+            own_ident = threading.get_ident()
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            cpu_start = {ident: thread_cpu_time(thread) for ident, thread in threads.items()}
+            process_start = time.process_time()
+            wall_start = time.perf_counter()
+            deadline = wall_start + self.duration
+            while time.perf_counter() < deadline:
+                frames = sys._current_frames()
+                for ident, frame in frames.items():
+                    if ident == own_ident:
+                        continue
+                    thread = threads.get(ident)
+                    if thread is None: # 采样期间新建的线程
+                        threads = {thread.ident: thread for thread in threading.enumerate()}
+                        thread = threads.get(ident)
+                        cpu_start.setdefault(ident, 0.0) # 新线程的CPU时间从0算起
+                    name = thread.name if thread is not None else f"thread-{ident}"
+                    self.stacks[(name, self._collapse(frame))] += 1
+                    self.thread_samples[name] += 1
+                del frames # 不持有其他线程的帧对象
+                self.rounds += 1
+                time.sleep(self.interval)
+            wall = time.perf_counter() - wall_start
+            process_cpu = time.process_time() - process_start
+            self._write(threads, cpu_start, wall, process_cpu)
+        except Exception as e:
+            self.error = e
+            print(f"性能采样失败: {e}")
+        finally:
+            self.done.set()
+
+    def _write(self, threads, cpu_start, wall, process_cpu):
+        """写出折叠调用栈和每线程统计"""
+        rows = []
+        for ident, thread in threads.items():
+            cpu = thread_cpu_time(thread)
+            start = cpu_start.get(ident)
+            cpu_used = cpu - start if cpu is not None and start is not None else None
+            rows.append((thread.name, self.thread_samples.get(thread.name, 0), cpu_used))
+        rows.sort(key=lambda row: -(row[2] or 0.0))
+        lines = [f"采样 {wall:.1f} 秒, 间隔 {self.interval * 1000:g}ms, 共 {self.rounds} 轮, "
+                 f"进程CPU {process_cpu * 1000:.0f}ms ({process_cpu / wall * 100:.1f}%)",
+                 f"{'线程':<24}{'采样数':>8}{'CPU时间ms':>12}{'CPU占用':>10}"]
+        for name, samples, cpu_used in rows:
+            cpu_text = f"{cpu_used * 1000:12.1f}{cpu_used / wall * 100:9.1f}%" if cpu_used is not None else f"{'--':>12}{'--':>10}"
+            lines.append(f"{name:<24}{samples:>8}{cpu_text}")
+        self.summary = "\n".join(lines)
+
+        os.makedirs(os.path.dirname(self.output), exist_ok=True)
+        with open(self.output + ".collapsed", "w", encoding="utf-8") as f:
+            for (name, stack), count in self.stacks.most_common():
+                f.write(f"{name.replace(';', '_').replace(' ', '_')};{stack} {count}\n")
+        with open(self.output + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.summary + "\n")
+        print(f"性能采样完成: {self.output}.collapsed / .txt\n{self.summary}")
+
+
+def start_profile(duration=DEFAULT_DURATION, prefix="profile"):
+    """开始一次后台采样并返回SamplingProfiler; 上一次采样还没结束时抛出RuntimeError"""
+    global _active
+    with _active_lock:
+        if _active is not None and not _active.done.is_set():
+            raise RuntimeError(f"已有性能采样正在进行, 输出到 {_active.output}")
+        _active = SamplingProfiler(duration, prefix).start()
+    print(f"开始性能采样 {_active.duration:g} 秒, 结果写入 {_active.output}.collapsed")
+    return _active
+
+
+def install_signal_handler(prefix="profile", duration=DEFAULT_DURATION):
+    """收到信号时开始一次采样: Linux/macOS为SIGUSR1(kill -USR1 <PID>), Windows为Ctrl+Break(SIGBREAK)
+    只能在主线程中调用; 返回使用的信号, 平台都不支持时返回None"""
+    signum = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+    if signum is None:
+        return None
+
+    def handler(signum, frame):
+        try:
+            start_profile(duration, prefix)
+        except RuntimeError as e:
+            print(e)
+
+    signal.signal(signum, handler)
+    return signum
+# ================= 采样分析器 =================
@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import threading
+
+
+# ================= 配置文件 =================
+# 服务端和客户端的可调参数放在同一个JSON配置文件里, 分"server"和"client"两节, 例如:
+#   {"server": {"max_fps": 30, "adjust_interval": 2, "quality_config": [...]},
+#    "client": {"server_port": 8585, "mouse_move_throttle": 0.02}}
+# 启动参数 --config <文件> 指定配置文件, 默认为脚本目录下的f_rc_config.json, 文件不存在时全部使用默认值
+# 启动参数 --set 键=值 覆盖单个参数(值按JSON解析, 解析失败按字符串), 优先级高于配置文件, 可重复使用
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "f_rc_config.json")
+POLL_INTERVAL = 1.0  # 检查配置文件是否被修改的间隔(秒)
+
+
+def config_path(argv=None):
+    """启动参数中--config指定的配置文件路径, 没有指定时用默认文件"""
+    argv = sys.argv if argv is None else argv
+    if "--config" in argv:
+        position = argv.index("--config") + 1
+        if position < len(argv):
+            return argv[position]
+    return DEFAULT_CONFIG_FILE
+
+
+def cli_overrides(argv=None):
+    """解析启动参数中所有的--set 键=值"""
+    argv = sys.argv if argv is None else argv
+    overrides = {}
+    for position, arg in enumerate(argv[:-1]):
+        if arg != "--set" or "=" not in argv[position + 1]:
+            continue
+        key, value = argv[position + 1].split("=", 1)
+        try:
+            overrides[key.strip()] = json.loads(value)
+        except ValueError:
+            overrides[key.strip()] = value
+    return overrides
+
+
+def read_section(path, section):
+    """读取配置文件中的一节; 文件不存在时返回空字典, 格式错误时返回None(调用方保留原有配置)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            values = json.load(f).get(section, {})
+        if not isinstance(values, dict):
+            raise ValueError(f'"{section}" 不是对象')
+        return values
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"读取配置文件 {path} 失败: {e}")
+        return None
+
+
+def load(section, argv=None):
+    """启动时加载一节配置并叠加启动参数覆盖, 返回(配置文件路径, 配置字典, 启动参数覆盖)"""
+    path = config_path(argv)
+    overrides = cli_overrides(argv)
+    values = read_section(path, section) or {}
+    values.update(overrides)
+    return path, values, overrides
+
+
+class ConfigWatcher:
+    """在后台线程中轮询配置文件的修改时间, 变化时重新读取该节(叠加启动参数覆盖)并回调callback(配置字典)
+    回调在监视线程中执行, 调用方需要时自行转到自己的线程"""
+
+    def __init__(self, path, section, callback, overrides=None):
+        self.path = path
+        self.section = section
+        self.callback = callback
+        self.overrides = overrides or {}
+        self.mtime = self._mtime()
+        self.stop_event = threading.Event()
+        threading.Thread(target=self._run, name="config-watcher", daemon=True).start()
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def _run(self):
+        while not self.stop_event.wait(POLL_INTERVAL):
+            mtime = self._mtime()
+            if mtime == self.mtime:
+                continue
+            self.mtime = mtime
+            values = read_section(self.path, self.section)
+            if values is None:  # 文件正在写入或格式错误, 等下次修改
+                continue
+            values.update(self.overrides)  # 启动参数始终优先
+            print(f"配置文件 {self.path} 已修改, 重新加载")
+            try:
+                self.callback(values)
+            except Exception as e:
+                print(f"应用配置时出错: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+# ================= 配置文件 =================
@@ -0,0 +1,1223 @@
+import socket
+import cv2
+import numpy as np
+import threading
+import time
+import json
+import keyboard
+import win32gui  # 用于窗口焦点检测和设置窗口图标
+import win32con  # 用于窗口常量
+import os
+import sys
+import selectors
+import struct
+import itertools
+import udp_video
+import settings
+import frame_pool
+import profiler
+from collections import deque
+
+# ==========================================================
+# 全局变量定义
+# ==========================================================
+window_name = 'F_RC'
+exit_event = threading.Event()
+is_fullscreen = False
+last_window_size = (0, 0)
+server_address = None
+server_port = 8585
+mouse_socket = None
+keyboard_socket = None
+is_mouse_down = False
+window_has_focus = False  # 窗口焦点状态
+
+# 新增：焦点状态变更标志
+focus_change_lock = threading.Lock()
+last_focus_state = False  # 记录上一次焦点状态
+
+# 新增：鼠标事件队列和处理逻辑
+mouse_event_queue = []  # 待发送的鼠标事件，连续的移动事件合并为最新的一个
+mouse_event_cond = threading.Condition()  # 有新事件时唤醒发送线程
+MOUSE_MOVE_THROTTLE = 0.01  # 10ms，限制鼠标移动事件发送频率（最后的位置总会在间隔结束后发出）
+
+# 输入延迟统计：每条鼠标键盘事件带上发送时间ts和序号seq，服务端分阶段统计后定期回报；两端时钟偏差用ping测量
+input_seq = itertools.count(1)
+clock_offset = None  # 服务端时钟减本机时钟（秒），测出来之前服务端只统计它内部的阶段
+clock_samples = deque(maxlen=8)  # 最近几次ping的（往返时间，时钟偏差）
+LATENCY_PING_INTERVAL = 2.0  # ping间隔（秒）
+
+# 本地光标：指针移动时立即在本地画出光标，不等服务端往返；没有本地移动时按服务端回报的真实位置校正
+local_cursor = None  # 最近一次鼠标事件在显示图像中的坐标
+local_cursor_time = 0.0
+remote_cursor = None  # 服务端回报的真实鼠标位置（0-1相对坐标）
+drag_start = None  # 左键按下的位置
+predict_drag = "--predict-drag" in sys.argv  # 拖动预测：按住左键拖动时本地先画出拖动框
+CURSOR_RECONCILE_DELAY = 0.3  # 本地停止移动这么久后改用服务端回报的位置
+
+# 视频走UDP传输（启动参数 --udp），丢包时不会因TCP队头阻塞卡住后续帧；鼠标键盘仍走TCP
+use_udp_video = "--udp" in sys.argv
+
+# 断线自动重连：服务端分配的会话令牌在宽限期内可以恢复原会话（画质档位、窗口尺寸、鼠标状态）
+session_token = None
+RECONNECT_INITIAL_DELAY = 0.05  # 第一次重连前的等待，之后每次翻倍
+RECONNECT_MAX_DELAY = 2.0  # 重连间隔上限
+RECONNECT_TIMEOUT = 60.0  # 断线超过这么久仍未连上就退出
+RECONNECT_CONNECT_TIMEOUT = 2.0  # 重连时单次连接的超时，避免窗口长时间无响应
+VIDEO_STALL_TIMEOUT = 3.0  # 视频连接这么久收不到数据就认为已断开（断网时TCP自己很久才会报错）
+
+
+# ==========================================================
+# 窗口焦点处理函数
+# ==========================================================
+def get_focused_window_title():
+    """获取当前焦点窗口的标题"""
+    try:
+        return win32gui.GetWindowText(win32gui.GetForegroundWindow())
+    except:
+        return ""
+
+
+def check_window_focus():
+    """持续检查窗口焦点状态并同步到服务器"""
+    global window_has_focus, last_focus_state, keyboard_socket
+    while not exit_event.is_set():
+        focused_title = get_focused_window_title()
+        current_focus = focused_title == window_name
+
+        # 检测到焦点状态变化时
+        with focus_change_lock:
+            if current_focus != last_focus_state:
+                last_focus_state = current_focus
+                if keyboard_socket and not current_focus:  # 失去焦点时发送释放指令
+                    try:
+                        # 发送特殊焦点丢失事件
+                        release_event = json.dumps({"type": "focus_lost"}).encode('utf-8') + b'\n'
+                        keyboard_socket.sendall(release_event)
+                        print("已通知服务器释放所有按键")
+                    except Exception as e:
+                        print(f"焦点状态同步失败: {e}")
+
+        window_has_focus = current_focus
+        time.sleep(0.1)  # 每100ms检查一次
+
+
+# ==========================================================
+# 画面绘制类
+# ==========================================================
+# 本地光标的箭头形状（相对指针位置的像素偏移）
+CURSOR_SHAPE = np.array([(0, 0), (0, 16), (4, 12), (7, 18), (9, 17), (6, 11), (11, 11)], dtype=np.int32)
+
+
+class FrameRenderer:
+    """把视频帧按比例居中绘制到常驻画布上，窗口和帧尺寸不变时复用布局和画布，每帧只做一次缩放或拷贝"""
+
+    def __init__(self):
+        self.window_size = (0, 0)
+        self.frame_size = (0, 0)
+        self.canvas = None  # 与窗口同尺寸的黑底画布，窗口尺寸变化时才重新分配
+        self.rect = None  # 画面在显示图像中的位置 (x, y, 宽, 高)，鼠标回调据此换算相对坐标
+        self.overlay_patch = None  # 叠加光标前保存的画布区域 (左, 上, 像素)
+
+    def update_layout(self, window_width, window_height, img_width, img_height):
+        """窗口或帧尺寸变化时重新计算布局"""
+        if (window_width, window_height) == self.window_size and (img_width, img_height) == self.frame_size:
+            return
+        self.window_size = (window_width, window_height)
+        self.frame_size = (img_width, img_height)
+        self.overlay_patch = None  # 画布会被重新分配或清空，保存的区域已失效
+
+        if window_width <= 10 or window_height <= 10:
+            # 窗口太小时直接显示原始帧，鼠标坐标就是帧坐标
+            self.canvas = None
+            self.rect = (0, 0, img_width, img_height)
+            return
+
+        img_ratio = img_width / img_height
+        window_ratio = window_width / window_height
+        if img_ratio > window_ratio:
+            new_width = window_width
+            new_height = int(window_width / img_ratio)
+        else:
+            new_height = window_height
+            new_width = int(window_height * img_ratio)
+
+        # 服务端已按窗口尺寸编码时直接贴图；窗口刚改变、新尺寸的帧还没到时才缩放
+        if img_width <= window_width and img_height <= window_height and \
+                new_width - img_width <= 2 and new_height - img_height <= 2:
+            new_width, new_height = img_width, img_height
+
+        if self.canvas is None or self.canvas.shape[:2] != (window_height, window_width):
+            self.canvas = np.zeros((window_height, window_width, 3), dtype=np.uint8)
+        else:
+            self.canvas[:] = 0  # 画面位置变了，清掉上一布局留下的内容
+        x_offset = (window_width - new_width) // 2
+        y_offset = (window_height - new_height) // 2
+        self.rect = (x_offset, y_offset, new_width, new_height)
+
+    def render(self, frame):
+        """把一帧画到画布上，返回要显示的图像"""
+        if self.canvas is None:
+            return frame
+        self.restore_overlay()
+        x, y, width, height = self.rect
+        target = self.canvas[y:y + height, x:x + width]
+        if (width, height) == self.frame_size:
+            np.copyto(target, frame)
+        else:
+            cv2.resize(frame, (width, height), dst=target)  # 直接缩放到画布对应区域，不产生中间数组
+        return self.canvas
+
+    def invalidate(self):
+        """下一帧到达时重新布局并清空画布（用于擦掉关闭的性能浮层）"""
+        self.window_size = (0, 0)
+
+    def draw_overlay(self, cursor, drag_from=None):
+        """在画布上叠加本地光标和拖动框；只保存并恢复被覆盖的小块区域，光标移动时不必重画整帧"""
+        self.restore_overlay()
+        if self.canvas is None or cursor is None:
+            return
+        points = CURSOR_SHAPE + np.array(cursor, dtype=np.int32)
+        left, top = points.min(axis=0) - 1
+        right, bottom = points.max(axis=0) + 2
+        if drag_from is not None:
+            left, top = min(left, drag_from[0]), min(top, drag_from[1])
+            right, bottom = max(right, drag_from[0] + 1), max(bottom, drag_from[1] + 1)
+        canvas_height, canvas_width = self.canvas.shape[:2]
+        left, top = max(0, int(left)), max(0, int(top))
+        right, bottom = min(canvas_width, int(right)), min(canvas_height, int(bottom))
+        if left >= right or top >= bottom:
+            return
+
+        self.overlay_patch = (left, top, self.canvas[top:bottom, left:right].copy())
+        if drag_from is not None:
+            cv2.rectangle(self.canvas, tuple(drag_from), tuple(cursor), (255, 200, 0), 1)
+        cv2.fillPoly(self.canvas, [points], (255, 255, 255))
+        cv2.polylines(self.canvas, [points], True, (0, 0, 0), 1)
+
+    def restore_overlay(self):
+        """恢复上一次叠加光标前的画布内容"""
+        if self.overlay_patch is not None:
+            left, top, patch = self.overlay_patch
+            self.canvas[top:top + patch.shape[0], left:left + patch.shape[1]] = patch
+            self.overlay_patch = None
+
+
+renderer = FrameRenderer()
+
+# ==========================================================
+# 性能浮层
+# ==========================================================
+HUD_TOGGLE_KEY = 'f10'  # 按F10显示/隐藏性能浮层，这个键不会发给服务端
+PROFILE_KEY = 'f9'  # 按F9对客户端所有线程性能采样，结果写入profiles目录，这个键也不会发给服务端
+HUD_HISTORY = 60  # 曲线保留最近60秒
+HUD_GRAPH_HEIGHT = 40
+
+
+class PerfHud:
+    """客户端性能浮层：每秒汇总一次接收帧率、码率、帧尺寸、解码/绘制耗时、服务端画质档位和延迟，并画出最近的帧率曲线"""
+
+    def __init__(self):
+        self.visible = False
+        self.lock = threading.Lock()  # 计数由接收、解码、显示三个线程更新
+        self.frames = 0
+        self.bytes = 0
+        self.decode_ms = 0.0
+        self.decode_count = 0
+        self.render_ms = 0.0
+        self.render_count = 0
+        self.frame_size = None
+        self.server_stats = None  # 服务端回报的画质档位
+        self.latency_ms = None  # 端到端延迟，可用时才显示
+        self.input_latency = None  # 服务端回报的输入延迟分阶段统计
+        self.history = deque(maxlen=HUD_HISTORY)  # 每秒的接收帧率
+        self.lines = []
+        self.last_update = time.time()
+        self.version = 0  # 内容变化时加一，显示循环据此决定是否重画
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.version += 1
+
+    def on_received(self, size):
+        with self.lock:
+            self.frames += 1
+            self.bytes += size
+
+    def on_decoded(self, ms, frame_size):
+        with self.lock:
+            self.decode_ms += ms
+            self.decode_count += 1
+            self.frame_size = frame_size
+
+    def on_rendered(self, ms):
+        with self.lock:
+            self.render_ms += ms
+            self.render_count += 1
+
+    def update(self):
+        """每秒汇总一次计数并生成显示文字"""
+        now = time.time()
+        elapsed = now - self.last_update
+        if elapsed < 1.0:
+            return
+        with self.lock:
+            fps = self.frames / elapsed
+            bitrate = self.bytes * 8 / elapsed / 1e6
+            decode_ms = self.decode_ms / self.decode_count if self.decode_count else 0.0
+            render_ms = self.render_ms / self.render_count if self.render_count else 0.0
+            self.frames = self.bytes = self.decode_count = self.render_count = 0
+            self.decode_ms = self.render_ms = 0.0
+        self.last_update = now
+        self.history.append(fps)
+
+        frame_size = f"{self.frame_size[0]}x{self.frame_size[1]}" if self.frame_size else "--"
+        stats = self.server_stats
+        tier = f"{stats['tier_width']}x{stats['tier_height']} q{stats['quality']}" if stats else "--"
+        if stats and stats.get("idle"):  # 服务端空闲降帧中，帧率低是正常的
+            tier += "  (idle)"
+        latency = f"{self.latency_ms:.0f} ms" if self.latency_ms is not None else "--"
+        stages = self.input_latency
+        if stages:  # 端到端延迟拆分为网络、排队、注入，看慢在哪一段
+            latency += "  (" + " / ".join(f"{name} {stages[stage]['p50']:.0f}" for name, stage in
+                                          (("net", "network"), ("queue", "queue"), ("inj", "inject"))
+                                          if stage in stages) + ")"
+        # OpenCV自带字体不支持中文，浮层文字用英文
+        self.lines = [
+            f"FPS {fps:.1f}  {bitrate:.2f} Mbps",
+            f"Frame {frame_size}",
+            f"Decode {decode_ms:.1f} ms  Render {render_ms:.1f} ms",
+            f"Server tier {tier}",
+            f"Latency {latency}",
+        ]
+        if self.visible:  # 隐藏时不用触发重画
+            self.version += 1
+
+    def draw(self, image):
+        """把浮层画在图像左上角，不透明底色，重复绘制结果不变"""
+        if not self.visible or not self.lines:
+            return
+        line_height = 18
+        width = 260
+        height = line_height * len(self.lines) + HUD_GRAPH_HEIGHT + 16
+        height = min(height, image.shape[0])
+        width = min(width, image.shape[1])
+        image[:height, :width] = (32, 32, 32)
+        for i, line in enumerate(self.lines):
+            cv2.putText(image, line, (6, 16 + i * line_height), cv2.FONT_HERSHEY_SIMPLEX, 0.45,
+                        (255, 255, 255), 1, cv2.LINE_AA)
+
+        # 帧率曲线
+        if len(self.history) >= 2:
+            top = line_height * len(self.lines) + 8
+            peak = max(60.0, max(self.history))
+            step = (width - 12) / (HUD_HISTORY - 1)
+            points = np.array([(6 + int(i * step), top + HUD_GRAPH_HEIGHT - int(fps / peak * HUD_GRAPH_HEIGHT))
+                               for i, fps in enumerate(self.history)], dtype=np.int32)
+            cv2.polylines(image, [points], False, (0, 255, 0), 1)
+
+
+hud = PerfHud()
+
+
+def cursor_position():
+    """要绘制的光标位置（显示图像坐标）：本地刚移动过就用本地位置，否则用服务端回报的真实位置"""
+    if local_cursor is not None and time.time() - local_cursor_time < CURSOR_RECONCILE_DELAY:
+        return local_cursor
+    rect = renderer.rect
+    if remote_cursor is not None and rect is not None:
+        x_offset, y_offset, width, height = rect
+        return x_offset + int(remote_cursor[0] * width), y_offset + int(remote_cursor[1] * height)
+    return local_cursor
+
+
+def receive_control_messages(sock):
+    """读取服务端在鼠标通道上发来的控制消息（真实鼠标位置、画质统计），连接关闭时结束"""
+    global remote_cursor
+    try:
+        with sock.makefile('rb') as stream:
+            for line in stream:
+                message = json.loads(line)
+                if message.get("type") == "cursor":
+                    remote_cursor = (float(message["x"]), float(message["y"]))
+                elif message.get("type") == "video_stats":
+                    hud.server_stats = message
+                elif message.get("type") == "pong":
+                    update_clock_offset(message)
+                elif message.get("type") == "input_latency":
+                    show_input_latency(message["events"])
+                elif message.get("type") == "config":  # 服务端下发的站点配置
+                    apply_client_config(message, reset=False)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+
+
+def stamp_input_event(event):
+    """给即将发送的鼠标键盘事件加上序号和发送时间"""
+    event["seq"] = next(input_seq)
+    event["ts"] = time.time()
+    return event
+
+
+def send_latency_ping(sock):
+    """发送时钟同步ping，顺带告诉服务端目前测得的时钟偏差"""
+    ping = {"type": "ping", "t0": time.time(), "offset": clock_offset}
+    sock.sendall(json.dumps(ping).encode('utf-8') + b'\n')
+
+
+def update_clock_offset(pong):
+    """按NTP的方法计算往返时间和时钟偏差，取最近几次中往返最短的一次（排队干扰最小）"""
+    global clock_offset
+    t0, t1, t2, t3 = float(pong["t0"]), float(pong["t1"]), float(pong["t2"]), time.time()
+    clock_samples.append(((t3 - t0) - (t2 - t1), ((t1 - t0) + (t2 - t3)) / 2))
+    clock_offset = min(clock_samples)[1]
+
+
+def show_input_latency(events):
+    """服务端回报的输入延迟：优先用鼠标移动的端到端P50作为浮层上的延迟"""
+    for event_type in ("move", "left_click", "key_down"):
+        stages = events.get(event_type)
+        if stages and "total" in stages:
+            hud.input_latency = stages
+            hud.latency_ms = stages["total"]["p50"]
+            return
+
+
+# ==========================================================
+# 鼠标事件处理函数
+# ==========================================================
+def process_mouse_events():
+    """发送鼠标事件：有新事件时被唤醒，按原顺序发送；移动事件限频，但最后的位置一定会发出"""
+    global mouse_socket, window_has_focus
+
+    last_move_time = 0
+    last_ping_time = 0
+    while not exit_event.is_set():
+        sock = mouse_socket
+        if sock and time.time() - last_ping_time >= LATENCY_PING_INTERVAL:  # 和鼠标事件在同一线程发送，不会交错
+            last_ping_time = time.time()
+            try:
+                send_latency_ping(sock)
+            except OSError:
+                pass
+
+        with mouse_event_cond:
+            # 没有事件时阻塞等待，不再轮询；超时只是为了检查退出标志
+            if not mouse_event_cond.wait_for(lambda: mouse_event_queue or exit_event.is_set(), 0.5):
+                continue
+            if not mouse_event_queue:
+                continue
+
+            # 队列里只剩一个移动事件且还在限频间隔内：等到间隔结束再发（期间的新移动会合并进来）
+            if len(mouse_event_queue) == 1 and mouse_event_queue[0]["type"] == "move":
+                delay = last_move_time + MOUSE_MOVE_THROTTLE - time.time()
+                if delay > 0:
+                    mouse_event_cond.wait(delay)
+                    continue
+
+            events = list(mouse_event_queue)
+            mouse_event_queue.clear()
+
+        sock = mouse_socket
+        if not window_has_focus or not sock:  # 失去焦点或正在重连时丢弃
+            continue
+
+        # 一次发送整批事件，点击与移动保持原来的先后顺序
+        try:
+            sock.sendall(b''.join(json.dumps(stamp_input_event(event)).encode('utf-8') + b'\n' for event in events))
+        except Exception as e:
+            print(f"发送鼠标事件失败: {e}")
+        if any(event["type"] == "move" for event in events):
+            last_move_time = time.time()
+
+
+def mouse_callback(event, x, y, flags, param):
+    """优化后的鼠标回调函数，使用事件队列"""
+    global is_mouse_down, window_has_focus, local_cursor, local_cursor_time, drag_start
+
+    rect = renderer.rect  # 绘制时缓存的画面位置，不用每个事件都查询窗口尺寸
+    if not window_has_focus or not mouse_socket or rect is None:
+        return
+
+    # 本地光标立即跟随指针，显示循环下一轮就会画出来
+    local_cursor = (x, y)
+    local_cursor_time = time.time()
+    if event == cv2.EVENT_LBUTTONDOWN:
+        drag_start = (x, y)
+    elif event == cv2.EVENT_LBUTTONUP:
+        drag_start = None
+
+    x_offset, y_offset, display_width, display_height = rect
+
+    if x >= x_offset and x < x_offset + display_width and y >= y_offset and y < y_offset + display_height:
+        rel_x = (x - x_offset) / display_width
+        rel_y = (y - y_offset) / display_height
+
+        event_type = None
+        if event == cv2.EVENT_LBUTTONDOWN:
+            event_type = "left_click"
+            is_mouse_down = True
+        elif event == cv2.EVENT_RBUTTONDOWN:
+            event_type = "right_click"
+        elif event == cv2.EVENT_LBUTTONUP:
+            event_type = "left_release"
+            is_mouse_down = False
+        elif event == cv2.EVENT_LBUTTONDBLCLK:
+            event_type = "left_double_click"
+        elif event == cv2.EVENT_MOUSEMOVE:
+            event_type = "move"
+        elif event == cv2.EVENT_MOUSEWHEEL:
+            event_type = "wheel"
+            wheel_direction = "up" if flags > 0 else "down"
+        elif event == cv2.EVENT_MOUSEHWHEEL:
+            event_type = "hwheel"
+            wheel_direction = "right" if flags > 0 else "left"
+
+        if event_type:
+            mouse_event = {
+                "type": event_type,
+                "x": rel_x,
+                "y": rel_y,
+                "is_down": is_mouse_down
+            }
+
+            if event_type in ["wheel", "hwheel"]:
+                mouse_event["direction"] = wheel_direction
+
+            # 将事件添加到队列
+            with mouse_event_cond:
+                if event_type == "move" and mouse_event_queue and mouse_event_queue[-1]["type"] == "move":
+                    mouse_event_queue[-1] = mouse_event  # 连续的移动只保留最新位置，不会越过前面的点击
+                else:
+                    mouse_event_queue.append(mouse_event)
+                mouse_event_cond.notify()
+
+
+# ==========================================================
+# 键盘事件处理函数
+# ==========================================================
+def keyboard_listener():
+    """键盘监听函数，仅在窗口有焦点时发送事件"""
+    global keyboard_socket, window_has_focus
+
+    if not keyboard_socket:
+        return
+
+    held_keys = set() # 当前按住的键(扫描码),用来过滤系统自动重复的按下事件
+
+    def send_key_event(e):
+        # 按住不放时系统会不断重复key_down,服务端有自己的重复定时器,这里只转发第一次按下
+        if e.event_type == keyboard.KEY_DOWN:
+            if e.scan_code in held_keys:
+                return
+            held_keys.add(e.scan_code)
+        else:
+            held_keys.discard(e.scan_code)
+        # 仅在窗口有焦点时发送键盘事件
+        if window_has_focus and e.name == HUD_TOGGLE_KEY:  # 性能浮层开关键只在本地处理
+            if e.event_type == keyboard.KEY_DOWN:
+                hud.toggle()
+            return
+        if window_has_focus and e.name == PROFILE_KEY:
+            if e.event_type == keyboard.KEY_DOWN:
+                try:
+                    profiler.start_profile(profiler.DEFAULT_DURATION, "client")
+                except RuntimeError as error:
+                    print(error)
+            return
+        if window_has_focus:
+            try:
+                key_event = {
+                    "type": "key_" + ("down" if e.event_type == keyboard.KEY_DOWN else "up"),
+                    "name": e.name,
+                    "scan_code": e.scan_code,
+                    "time": e.time
+                }
+                keyboard_socket.sendall(json.dumps(stamp_input_event(key_event)).encode('utf-8') + b'\n')
+            except Exception as e:
+                print(f"发送键盘事件失败: {e}")
+
+    # 注册键盘事件回调
+    keyboard.hook(send_key_event)
+
+    # 保持线程运行
+    while not exit_event.is_set():
+        time.sleep(0.1)
+
+
+# ==========================================================
+# 窗口设置函数
+# ==========================================================
+def set_window_icon():
+    """设置窗口图标"""
+    try:
+        # 获取窗口句柄
+        hwnd = win32gui.FindWindow(None, window_name)
+
+        # 检查图标文件是否存在
+        icon_path = "exe.ico"
+        if not os.path.exists(icon_path):
+            print(f"警告: 图标文件 '{icon_path}' 不存在，使用默认图标")
+            return
+
+        # 加载图标资源
+        icon_flags = win32con.LR_LOADFROMFILE | win32con.LR_DEFAULTSIZE
+        try:
+            hicon = win32gui.LoadImage(
+                0, icon_path, win32con.IMAGE_ICON, 0, 0, icon_flags)
+        except Exception as e:
+            print(f"加载图标失败: {e}，使用默认图标")
+            return
+
+        # 设置窗口图标（大图标和小图标）
+        if hicon:
+            win32gui.SendMessage(hwnd, win32con.WM_SETICON, win32con.ICON_BIG, hicon)
+            win32gui.SendMessage(hwnd, win32con.WM_SETICON, win32con.ICON_SMALL, hicon)
+            print("窗口图标已设置")
+    except Exception as e:
+        print(f"设置窗口图标时出错: {e}")
+
+
+# ==========================================================
+# 服务器连接函数（Happy Eyeballs，RFC 8305）
+# ==========================================================
+CONNECT_ATTEMPT_DELAY = 0.25  # 上一个地址250ms内没连上就并行尝试下一个地址
+CONNECT_TIMEOUT = 10.0
+
+
+def connect_happy_eyeballs(host, port, attempt_delay=CONNECT_ATTEMPT_DELAY, timeout=CONNECT_TIMEOUT):
+    """解析主机名/地址并连接，IPv6与IPv4地址交替错开发起连接，最先连上的获胜
+
+    某个地址族的网络不通时不用等它超时，返回已连接的TCP socket
+    """
+    infos = socket.getaddrinfo(host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+    if not infos:
+        raise OSError(f"无法解析服务器地址: {host}")
+
+    # 地址按IPv6优先、两个地址族交替排列
+    ipv6 = [info for info in infos if info[0] == socket.AF_INET6]
+    ipv4 = [info for info in infos if info[0] != socket.AF_INET6]
+    candidates = []
+    for i in range(max(len(ipv6), len(ipv4))):
+        candidates.extend(group[i] for group in (ipv6, ipv4) if i < len(group))
+
+    selector = selectors.DefaultSelector()
+    pending = {}  # socket -> 目标地址
+    last_error = None
+    deadline = time.time() + timeout
+    next_attempt = time.time()
+    try:
+        while time.time() < deadline:
+            # 到时间了（或当前没有进行中的尝试）就发起下一个地址的连接
+            if candidates and (not pending or time.time() >= next_attempt):
+                family, sock_type, proto, _, sockaddr = candidates.pop(0)
+                sock = socket.socket(family, sock_type, proto)
+                sock.setblocking(False)
+                try:
+                    sock.connect(sockaddr)
+                except (BlockingIOError, InterruptedError):
+                    pass
+                except OSError as e:  # 地址族不可用等立即失败的情况
+                    last_error = e
+                    sock.close()
+                    continue
+                selector.register(sock, selectors.EVENT_WRITE)
+                pending[sock] = sockaddr
+                next_attempt = time.time() + attempt_delay
+
+            if not pending:
+                break
+
+            wait = deadline - time.time()
+            if candidates:
+                wait = min(wait, next_attempt - time.time())
+            for key, _ in selector.select(max(wait, 0)):
+                sock = key.fileobj
+                selector.unregister(sock)
+                sockaddr = pending.pop(sock)
+                error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if error:
+                    last_error = OSError(error, os.strerror(error), sockaddr[0])
+                    sock.close()
+                    continue
+                sock.setblocking(True)
+                return sock
+        raise last_error or socket.timeout(f"连接服务器超时: {host}")
+    finally:
+        for sock in pending:  # 关闭输掉竞争的连接
+            sock.close()
+        selector.close()
+
+
+def with_port(sockaddr, port):
+    """把getpeername()得到的地址换成同一主机的另一个端口（IPv6保留flowinfo和scope_id）"""
+    return (sockaddr[0], port) + tuple(sockaddr[2:])
+
+
+# ==========================================================
+# 视频帧接收和处理函数
+# ==========================================================
+def recv_exact(sock, size):
+    """从TCP连接读取恰好size字节，连接关闭时返回None"""
+    data = bytearray()
+    while len(data) < size:
+        packet = sock.recv(size - len(data))
+        if not packet:
+            return None
+        data += packet
+    return bytes(data)
+
+
+def recv_into_exact(sock, view):
+    """把数据直接读进view（memoryview）直到填满，连接关闭时返回False"""
+    received = 0
+    while received < len(view):
+        count = sock.recv_into(view[received:])
+        if not count:
+            return False
+        received += count
+    return True
+
+
+# JPEG数据读进缓冲池中的缓冲，解码后放回复用；每帧大小不同，按RECEIVE_BUFFER_STEP取整后同一块缓冲可以反复使用
+RECEIVE_BUFFER_STEP = 256 * 1024
+receive_buffers = frame_pool.FramePool()
+
+
+def recv_video_frame(video_socket):
+    """从TCP视频连接读取一帧（4字节大端序长度 + JPEG数据），连接关闭时返回None
+    返回缓冲池中一块缓冲的前N字节（memoryview），用完后调用release_frame_data()放回
+    服务端拒绝连接时回的是一行JSON错误消息，以"{"开头，不可能是合法的帧长度"""
+    size_data = recv_exact(video_socket, 4)
+    if not size_data:
+        return None
+    if size_data.startswith(b'{'):
+        error = json.loads(size_data + (recv_line(video_socket) or b''))
+        raise ConnectionRefusedError(error.get("message", "服务端拒绝视频连接"))
+    size = int.from_bytes(size_data, byteorder='big')
+    capacity = max(1, -(-size // RECEIVE_BUFFER_STEP)) * RECEIVE_BUFFER_STEP
+    data = memoryview(receive_buffers.acquire((capacity,)))[:size]
+    if not recv_into_exact(video_socket, data):
+        release_frame_data(data)
+        return None
+    return data
+
+
+def release_frame_data(data):
+    """把一帧的接收缓冲放回缓冲池（UDP重组出的是bytes，不用放回）"""
+    if isinstance(data, memoryview):
+        receive_buffers.release(data.obj)
+
+
+def send_view_size(video_socket, video_udp, width, height):
+    """把窗口尺寸回报给服务端，服务端直接按这个尺寸编码，客户端不再二次缩放"""
+    try:
+        if video_udp:
+            video_udp.send_view_size(width, height)
+        else:
+            message = {"type": "view_size", "width": width, "height": height}
+            video_socket.sendall(json.dumps(message).encode('utf-8') + b'\n')
+    except Exception as e:
+        print(f"发送窗口尺寸失败: {e}")
+
+
+def recv_line(sock, limit=4096):
+    """从TCP连接读取一行（不含换行符），连接关闭时返回None"""
+    data = bytearray()
+    while not data.endswith(b'\n'):
+        byte = sock.recv(1)
+        if not byte or len(data) >= limit:
+            return None
+        data += byte
+    return bytes(data[:-1])
+
+
+def send_hello(sock):
+    """连接建立后先发送会话握手，带上之前的会话令牌（第一次连接时为None）"""
+    hello = {"type": "hello", "session": session_token}
+    sock.sendall(json.dumps(hello).encode('utf-8') + b'\n')
+
+
+def connect_server(connect_timeout=CONNECT_TIMEOUT):
+    """连接视频、鼠标、键盘三个通道并完成会话握手，返回(video_socket, video_udp, 是否恢复了原会话)"""
+    global mouse_socket, keyboard_socket, session_token
+
+    # 鼠标通道先用Happy Eyeballs选出能连通的地址，视频和键盘通道直接连同一个地址
+    video_socket = None
+    video_udp = None
+    keyboard_sock = None
+    mouse_sock = connect_happy_eyeballs(server_address, server_port + 1, timeout=connect_timeout)
+    try:
+        mouse_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # 小包立即发送，不等Nagle攒包
+        family = mouse_sock.family
+        peer = mouse_sock.getpeername()
+
+        # 鼠标通道负责会话握手：服务端回复会话令牌，以及是否恢复了原来的会话
+        mouse_sock.settimeout(connect_timeout)
+        send_hello(mouse_sock)
+        line = recv_line(mouse_sock)
+        if not line:
+            raise ConnectionError("会话握手失败")
+        reply = json.loads(line)
+        if reply.get("type") == "error":  # 服务端连接数或会话数已满，退避后重试
+            raise ConnectionRefusedError(reply.get("message", "服务端拒绝连接"))
+        session_token = reply["token"]
+        resumed = reply.get("resumed", False)
+        mouse_sock.settimeout(None)
+
+        if use_udp_video:
+            video_udp = udp_video.UdpVideoClient(peer[0], server_port, family,
+                                                 token=session_token, stall_timeout=VIDEO_STALL_TIMEOUT)
+        else:
+            video_socket = socket.socket(family, socket.SOCK_STREAM)
+            video_socket.settimeout(connect_timeout)
+            video_socket.connect(with_port(peer, server_port))
+            send_hello(video_socket)
+            video_socket.settimeout(VIDEO_STALL_TIMEOUT)  # 长时间收不到帧说明链路已断，触发重连
+
+        keyboard_sock = socket.socket(family, socket.SOCK_STREAM)
+        keyboard_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        keyboard_sock.settimeout(connect_timeout)
+        keyboard_sock.connect(with_port(peer, server_port + 2))
+        send_hello(keyboard_sock)
+        line = recv_line(keyboard_sock)  # 服务端回一行确认，连接数已满时回错误
+        if not line:
+            raise ConnectionError("键盘通道握手失败")
+        reply = json.loads(line)
+        if reply.get("type") == "error":
+            raise ConnectionRefusedError(reply.get("message", "服务端拒绝键盘连接"))
+        keyboard_sock.settimeout(None)
+    except Exception:
+        for sock in (mouse_sock, keyboard_sock, video_socket, video_udp):
+            if sock:
+                sock.close()
+        raise
+
+    # 握手全部完成后才交给输入线程使用
+    mouse_socket, keyboard_socket = mouse_sock, keyboard_sock
+    threading.Thread(target=receive_control_messages, args=(mouse_sock,), name="control-receiver", daemon=True).start()
+    print(f"已连接到服务器: {peer[0]}（{'IPv6' if family == socket.AF_INET6 else 'IPv4'}"
+          f"{'，视频使用UDP传输' if use_udp_video else ''}，{'恢复' if resumed else '新建'}会话）")
+    return video_socket, video_udp, resumed
+
+
+def close_connections(video_socket, video_udp):
+    """关闭所有通道连接"""
+    global mouse_socket, keyboard_socket
+    sockets = (video_socket, video_udp, mouse_socket, keyboard_socket)
+    mouse_socket = None
+    keyboard_socket = None
+    for sock in sockets:
+        if sock:
+            try:
+                if isinstance(sock, socket.socket):
+                    sock.shutdown(socket.SHUT_RDWR)  # 唤醒阻塞在recv上的接收线程
+            except OSError:
+                pass
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+def window_closed():
+    """窗口被用户关闭时返回True"""
+    return cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1
+
+
+def reconnect():
+    """断线后按指数退避自动重连，凭会话令牌恢复原会话；窗口被关闭或超过RECONNECT_TIMEOUT仍未连上时返回None"""
+    delay = RECONNECT_INITIAL_DELAY
+    start = time.time()
+    attempt = 0
+    while time.time() - start < RECONNECT_TIMEOUT:
+        attempt += 1
+        try:
+            result = connect_server(RECONNECT_CONNECT_TIMEOUT)
+            print(f"第{attempt}次重连成功，断线{time.time() - start:.2f}秒")
+            return result
+        except (OSError, ValueError, KeyError) as e:
+            print(f"第{attempt}次重连失败: {e}，{delay:.2f}秒后重试")
+
+        # 退避等待期间继续刷新窗口，保持窗口可以拖动和关闭
+        wait_until = time.time() + delay
+        while time.time() < wait_until:
+            cv2.waitKey(10)
+            if window_closed():
+                return None
+        delay = min(delay * 2, RECONNECT_MAX_DELAY)
+    print("重连超时，放弃连接")
+    return None
+
+
+# ==========================================================
+# 视频流水线（接收线程 -> 解码线程 -> 显示循环）
+# ==========================================================
+PIPELINE_REPORT_INTERVAL = 5.0  # 流水线统计输出间隔（秒）
+
+# libjpeg可以在DCT域直接按1/2、1/4、1/8解码，比完整解码再缩小快得多
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def jpeg_size(data):
+    """从JPEG的SOF段读出图像宽高而不解码，解析失败返回None"""
+    i = 2  # 跳过SOI标记
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # 填充字节
+            i += 1
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):  # SOFn，排除DHT/JPG/DAC
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None
+
+
+def choose_decode_flag(frame_size, window_size):
+    """按帧与窗口的尺寸比选择缩小解码倍数，缩小后的帧仍不小于窗口中的显示区域，最后只需小幅缩放"""
+    window_width, window_height = window_size
+    if not frame_size or window_width <= 10 or window_height <= 10:
+        return cv2.IMREAD_COLOR
+    scale = min(window_width / frame_size[0], window_height / frame_size[1])  # 帧在窗口中显示时的缩放比例
+    for factor, flag in REDUCED_DECODE_FLAGS:
+        if factor * scale <= 1:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+class LatestSlot:
+    """只保存最新一项的交接槽：放入时直接替换还没被取走的旧项并计数，取出的总是最新一项"""
+
+    def __init__(self, on_drop=None):
+        self.cond = threading.Condition()
+        self.item = None
+        self.dropped = 0  # 没被取走就被替换掉的数量
+        self.on_drop = on_drop  # 被替换的旧项交给它处理（如放回缓冲池）
+        self.closed = False
+
+    def put(self, item):
+        with self.cond:
+            if self.item is not None:
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(self.item)
+            self.item = item
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """取出最新一项，超时或已关闭且为空时返回None"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.item is not None or self.closed, timeout)
+            item, self.item = self.item, None
+            return item
+
+    def close(self):
+        """生产者结束，唤醒等待的消费者"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def finished(self):
+        with self.cond:
+            return self.closed and self.item is None
+
+
+class VideoPipeline:
+    """一条视频连接的客户端流水线：接收和解码各占一个线程，显示在窗口线程中进行
+    解码慢或拖动窗口时只会丢弃中间帧，不会让网络接收积压，显示的总是最新解码的一帧"""
+
+    def __init__(self, video_socket, video_udp):
+        self.video_socket = video_socket
+        self.video_udp = video_udp
+        self.encoded = LatestSlot(on_drop=release_frame_data)  # 接收线程 -> 解码线程（JPEG数据）
+        self.decoded = LatestSlot()  # 解码线程 -> 显示循环（解码后的图像）
+        self.received_count = 0
+        self.decoded_count = 0
+        self.displayed_count = 0
+        self.error = None  # 接收线程遇到的连接错误，显示循环结束后交给重连逻辑
+        self.running = True
+        self.last_report = time.time()
+        for target, name in ((self._receive_loop, "video-receive"), (self._decode_loop, "video-decode")):
+            threading.Thread(target=target, name=name, daemon=True).start()
+
+    def _receive_loop(self):
+        """接收线程：只负责从网络读出完整的一帧，读到就交给解码线程"""
+        try:
+            while self.running:
+                # 接收一帧完整视频数据（UDP模式下由分片重组得到）
+                data = self.video_udp.recv_frame() if self.video_udp else recv_video_frame(self.video_socket)
+                if not data:
+                    self.error = ConnectionError("服务器关闭了视频连接")
+                    break
+                self.received_count += 1
+                hud.on_received(len(data))
+                self.encoded.put(data)
+        except Exception as e:
+            if self.running:  # 主动停止时关闭连接引起的错误不算
+                self.error = e
+        finally:
+            self.encoded.close()
+
+    def _decode_loop(self):
+        """解码线程：总是解码最新收到的一帧，来不及解码的旧帧直接丢弃
+        窗口比帧小很多时（如缩成小窗口）直接按1/2、1/4、1/8缩小解码"""
+        try:
+            while True:
+                data = self.encoded.get()
+                if data is None:  # 接收线程已结束
+                    break
+                frame_size = jpeg_size(data)
+                flag = choose_decode_flag(frame_size, renderer.window_size)
+                decode_start = time.time()
+                frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+                release_frame_data(data)  # 解码结果是新数组，不再引用接收缓冲
+                if frame is None:
+                    print("收到无法解码的视频帧")
+                    continue
+                hud.on_decoded((time.time() - decode_start) * 1000, frame_size)
+                self.decoded_count += 1
+                self.decoded.put(frame)
+        finally:
+            self.decoded.close()
+
+    def next_frame(self, timeout):
+        """显示循环取最新解码的一帧，没有新帧时返回None"""
+        frame = self.decoded.get(timeout)
+        if frame is not None:
+            self.displayed_count += 1
+        return frame
+
+    def finished(self):
+        """接收和解码都已结束（连接断开）"""
+        return self.decoded.finished()
+
+    def report(self):
+        """定期输出各阶段的帧数和丢帧数"""
+        now = time.time()
+        if now - self.last_report < PIPELINE_REPORT_INTERVAL:
+            return
+        self.last_report = now
+        print(f"[流水线] 接收: {self.received_count} 解码: {self.decoded_count} 显示: {self.displayed_count} "
+              f"解码前丢弃: {self.encoded.dropped} 显示前丢弃: {self.decoded.dropped}")
+
+    def stop(self):
+        self.running = False
+        self.encoded.close()
+
+
+def show_frames(video_socket, video_udp):
+    """显示循环：取最新解码的帧绘制到窗口，直到连接断开或窗口被关闭；连接出错时抛出异常交给重连逻辑"""
+    global last_window_size
+
+    pipeline = VideoPipeline(video_socket, video_udp)
+    image = None  # 当前显示的图像
+    drawn_overlay = None  # 已经画在图像上的光标和拖动框
+    drawn_hud = None  # 已经画在图像上的性能浮层版本
+    hud_shown = False  # 图像上是否画着性能浮层
+    try:
+        while not exit_event.is_set() and not pipeline.finished():
+            frame = pipeline.next_frame(timeout=0.01)
+            if frame is not None:
+                render_start = time.time()
+                img_height, img_width = frame.shape[:2]
+
+                # 获取窗口尺寸
+                _, _, window_width, window_height = cv2.getWindowImageRect(window_name)
+
+                # 检测窗口大小变化
+                if (window_width, window_height) != last_window_size:
+                    last_window_size = (window_width, window_height)
+                    print(f"窗口大小已调整为: {window_width}x{window_height}")
+                    if window_width > 10 and window_height > 10:
+                        send_view_size(video_socket, video_udp, window_width, window_height)
+
+                # 根据窗口大小调整视频帧显示（布局只在窗口或帧尺寸变化时重新计算）
+                renderer.update_layout(window_width, window_height, img_width, img_height)
+                image = renderer.render(frame)
+
+            # 新帧到达、指针移动或浮层内容变化时叠加光标和浮层，不用等下一帧
+            hud.update()
+            overlay = (cursor_position(), drag_start if predict_drag else None)
+            if image is not None and (frame is not None or overlay != drawn_overlay or hud.version != drawn_hud):
+                renderer.restore_overlay()
+                if hud_shown and not hud.visible:  # 浮层可能画在黑边上，下一帧重画整个画布
+                    renderer.invalidate()
+                hud_shown = hud.visible
+                hud.draw(image)
+                renderer.draw_overlay(*overlay)
+                drawn_overlay = overlay
+                drawn_hud = hud.version
+                cv2.imshow(window_name, image)
+            if frame is not None:
+                hud.on_rendered((time.time() - render_start) * 1000)
+
+            # 窗口刷新（没有新帧时也要处理窗口消息，拖动窗口不会影响接收）
+            cv2.waitKey(1)
+            pipeline.report()
+
+            # 检测窗口是否关闭
+            if window_closed():
+                exit_event.set()
+                break
+    finally:
+        pipeline.stop()
+    if pipeline.error and not exit_event.is_set():
+        raise pipeline.error
+
+
+def receive_frames():
+    """连接服务器，接收视频帧并显示；断线后自动重连"""
+    global last_window_size
+
+    try:
+        video_socket, video_udp, _ = connect_server()
+    except Exception as e:
+        print(f"连接错误: {e}")
+        exit_event.set()
+        return
+
+    # 创建OpenCV窗口，鼠标回调只注册一次
+    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+    cv2.setMouseCallback(window_name, mouse_callback)
+
+    # 启动窗口焦点检查线程
+    focus_thread = threading.Thread(target=check_window_focus, name="focus")
+    focus_thread.daemon = True
+    focus_thread.start()
+
+    # 启动键盘监听线程
+    keyboard_thread = threading.Thread(target=keyboard_listener, name="keyboard")
+    keyboard_thread.daemon = True
+    keyboard_thread.start()
+
+    # 启动鼠标事件处理线程
+    mouse_thread = threading.Thread(target=process_mouse_events, name="mouse")
+    mouse_thread.daemon = True
+    mouse_thread.start()
+
+    # 设置窗口图标（新增）
+    # 延迟设置，确保窗口已创建
+    threading.Timer(1.0, set_window_icon).start()
+
+    try:
+        while not exit_event.is_set():
+            try:
+                show_frames(video_socket, video_udp)
+            except Exception as e:
+                print(f"连接错误: {e}")
+            close_connections(video_socket, video_udp)
+            video_socket = video_udp = None
+            if exit_event.is_set():
+                break
+
+            # 窗口保持打开，显示最后一帧，同时在后台重连
+            result = reconnect()
+            if result is None:
+                exit_event.set()
+                break
+            video_socket, video_udp, resumed = result
+            if not resumed:  # 会话已过期，服务端不知道窗口尺寸，需要重新回报
+                last_window_size = (0, 0)
+    finally:
+        # 清理资源
+        close_connections(video_socket, video_udp)
+        cv2.destroyAllWindows()
+
+
+# ==========================================================
+# 主函数
+# ==========================================================
+# 可配置项的默认值：配置文件"client"节和启动参数--set（见settings.py）没有给出的项使用这些值
+CLIENT_CONFIG_DEFAULTS = {"server_port": 8585, "mouse_move_throttle": 0.01}
+
+
+def apply_client_config(values, reset=True):
+    """应用客户端配置：鼠标移动限频立即生效，服务器端口在下一次连接时生效
+    reset为True时缺少的项恢复默认值（配置文件重新加载），服务端下发的配置只覆盖它给出的项"""
+    global server_port, MOUSE_MOVE_THROTTLE
+    if reset:
+        values = {**CLIENT_CONFIG_DEFAULTS, **values}
+    try:
+        if "server_port" in values:
+            server_port = int(values["server_port"])
+        if "mouse_move_throttle" in values and values["mouse_move_throttle"] is not None:
+            throttle = float(values["mouse_move_throttle"])
+            if throttle != MOUSE_MOVE_THROTTLE:
+                MOUSE_MOVE_THROTTLE = throttle
+                print(f"鼠标移动限频: {throttle * 1000:.0f}ms")
+    except (TypeError, ValueError) as e:
+        print(f"客户端配置无效: {e}")
+
+
+def main():
+    global server_address
+
+    # 读取配置文件和启动参数，配置文件修改后自动重新加载
+    config_file, config_values, overrides = settings.load("client")
+    apply_client_config(config_values)
+    settings.ConfigWatcher(config_file, "client", apply_client_config, overrides)
+    # 性能采样: 窗口有焦点时按F9，或 kill -USR1 <PID>(Windows控制台按Ctrl+Break)
+    profiler.install_signal_handler("client")
+
+    # 获取服务器地址并启动接收线程
+    # 支持IPv4、IPv6地址或主机名，IPv6地址可带方括号
+    server_address = input("请输入服务器地址(IPv4/IPv6/主机名): ").strip().strip('[]')
+    print(f"正在连接到服务器: {server_address} 端口{server_port}")
+
+    receive_thread = threading.Thread(target=receive_frames, name="display")
+    receive_thread.daemon = True
+    receive_thread.start()
+
+    # 等待退出事件
+    try:
+        while not exit_event.is_set():
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        print("程序已退出")
+    finally:
+        # 清理资源
+        cv2.destroyAllWindows()
+        exit_event.set()
+
+
+# ==========================================================
+# 程序入口
+# ==========================================================
+if __name__ == "__main__":
+    main()
+
+"""
+程序初始化
+从用户输入获取服务器 IPv6 地址
+启动接收线程处理视频流和用户输入
+视频流接收与显示receive_frames函数
+连接服务器的三个端口：视频 (8585)、鼠标 (8586)、键盘 (8587)
+创建 OpenCV 窗口显示远程桌面
+启动焦点检查线程和键盘监听线程
+循环接收视频帧：
+接收帧大小信息（4 字节）
+接收完整帧数据
+解码并根据窗口大小自适应显示
+窗口焦点管理check_window_focus函数
+每 100ms 检查一次窗口焦点状态
+当窗口失去焦点时，发送特殊事件通知服务器释放所有按键
+鼠标事件处理mouse_callback函数
+仅在窗口有焦点时处理鼠标事件
+计算鼠标在远程桌面中的相对位置
+处理点击、双击、移动和滚轮事件
+将事件发送到服务器
+键盘事件处理keyboard_listener函数
+仅在窗口有焦点时处理键盘事件
+监听所有键盘按键的按下和释放事件
+将按键事件发送到服务器
+窗口管理set_window_icon函数
+设置窗口图标（如果存在 exe.ico 文件）
+处理窗口大小变化和关闭事件
+"""
\ No newline at end of file
@@ -0,0 +1,1780 @@
+import socket
+import os
+import re
+import threading
+import signal
+import json
+import time
+import ctypes
+import sys
+import traceback
+import asyncio
+import secrets
+import heapq
+import itertools
+import bisect
+import subprocess
+import udp_video
+import input_backend
+import settings
+import profiler
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+# tkinter(GUI)和capture_process(cv2/numpy/mss)在用到时才导入,无界面启动和开始监听都不必等它们
+STARTUP_TIME = time.time() # 用于统计从启动到开始监听的耗时
+
+
+# ================= 管理员权限获取部分 =================
+def is_admin():
+    """检查当前进程是否以管理员权限运行"""
+    try:
+        # ctypes.windll.shell32 访问Windows Shell32库
+        # IsUserAnAdmin() 是该库中的函数，返回非零值表示管理员
+        return ctypes.windll.shell32.IsUserAnAdmin() # 非零为True
+    except:
+        return False # 异常时默认非管理员
+
+
+def request_admin_privileges():
+    """请求提升管理员权限(重新启动程序并获取管理员身份)"""
+    if not is_admin(): # 如果当前非管理员
+        print("正在请求管理员权限...")
+        # ShellExecuteW 是Windows API，用于启动新进程
+        # 参数说明：
+        # hwnd: 父窗口句柄 None表示无
+        # lpVerb: 操作动词,"runas"表示以管理员身份运行
+        # lpFile: 要运行的程序路径(sys.executable是Python解释器路径)
+        # lpParameters: 命令行参数(__file__是当前脚本路径)
+        # lpDirectory: 工作目录(None表示使用默认)
+        # nShowCmd: 窗口显示方式(1表示正常显示)
+        ctypes.windll.shell32.ShellExecuteW(
+            None, "runas", sys.executable, __file__, None, 1
+        )
+        sys.exit() # 退出当前非管理员进程,等待新进程启动
+# ================= 管理员权限获取部分 =================
+
+
+# ================= 本机地址获取部分 =================
+# 服务端在所有网卡上双栈监听,这里获取的地址只用于在界面和控制台上显示给用户
+# 地址只获取一次并缓存,界面和控制台共用;ipconfig最多执行一次
+_address_lock = threading.RLock()
+_address_cache = {} # "ipconfig" -> ipconfig /all的输出, "addresses" -> (IPv4地址, IPv6地址)
+
+
+def ipconfig_output():
+    """执行一次ipconfig /all并缓存输出,IPv4和IPv6的解析共用"""
+    with _address_lock:
+        if "ipconfig" not in _address_cache:
+            # os.popen 执行系统命令,返回命令输出流
+            _address_cache["ipconfig"] = os.popen("ipconfig /all").read()
+        return _address_cache["ipconfig"]
+
+
+def local_addresses():
+    """返回(IPv4地址, IPv6地址),第一次调用时获取,之后直接用缓存;GUI线程和主线程同时调用也只获取一次"""
+    with _address_lock:
+        if "addresses" not in _address_cache:
+            _address_cache["addresses"] = (get_public_ip(), get_ipv6_address())
+        return _address_cache["addresses"]
+
+
+def get_public_ip():
+    """获取公网IPv4地址（优先UDP协议，失败则解析ipconfig）"""
+    try:
+        # 使用UDP协议获取公网IP（不会实际发送数据）
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect(("8.8.8.8", 80))
+        ip = s.getsockname()[0]
+        s.close()
+        return ip
+    except Exception as e:
+        print(f"UDP获取IP失败: {e}，尝试解析ipconfig")
+        try:
+            # 解析ipconfig输出获取IPv4地址
+            output = ipconfig_output()
+            pattern = re.compile(r"IPv4 Address.*?(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})", re.I)
+            matches = pattern.findall(output)
+            for ip in matches:
+                if not ip.startswith(('127.', '192.168.', '10.', '172.16.')):
+                    return ip
+            # 未找到公网IP时返回第一个有效地址
+            return matches[0] if matches else "127.0.0.1"
+        except Exception as e:
+            print(f"解析ipconfig失败: {e}")
+            return "127.0.0.1"
+
+
+def get_ipv6_address():
+    """获取本机有效IPv6地址(优先全局单播地址,非链路本地地址)"""
+    try:
+        # 与IPv4相同,先用UDP协议取出访问公网时的源地址(不会实际发送数据,也不必执行ipconfig)
+        s = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+        try:
+            s.connect(("2001:4860:4860::8888", 80))
+            ip = s.getsockname()[0]
+        finally:
+            s.close()
+        if not ip.lower().startswith("fe80"):
+            return ip
+    except OSError:
+        pass # 没有IPv6路由,解析ipconfig
+    try:
+        # "ipconfig /all" 获取所有网络接口配置信息
+        output = ipconfig_output()  # 读取命令输出文本(已缓存)
+        # 正则表达式1: 匹配标准8段IPv6地址,非fe80::开头
+        # (?!fe80::) 负向先行断言: 排除以fe80::开头的链路本地地址
+        # ([0-9a-f]{1,4}:){7}[0-9a-f]{1,4} 匹配8个16进制段,每段1-4字符,用:分隔
+        # re.I 标志使匹配不区分大小写
+        result = re.findall(r"((?!fe80::)([0-9a-f]{1,4}:){7}[0-9a-f]{1,4})", output, re.I)
+
+        if not result:# 未找到标准格式,尝试匹配压缩格式(允许省略部分段)
+            # ([0-9a-f]{1,4}(:[0-9a-f]{1,4}){1,6}) 匹配2-7个段(压缩格式)
+            result = re.findall(r"((?!fe80::)[0-9a-f]{1,4}(:[0-9a-f]{1,4}){1,6})", output, re.I)
+            if not result: # 仍未找到,抛出异常
+                raise ValueError("未找到有效的IPv6地址")
+
+        # result[0][0]：正则匹配结果中,第一个全匹配项(组0)的第一个捕获组
+        return result[0][0] # 返回第一个有效IPv6地址
+    except Exception as e:
+        print(f"获取IPv6地址失败: {e}")
+        try: # 回退到IPv4地址
+            return socket.gethostbyname(socket.gethostname())  # 获取主机IPv4地址
+        except:
+            return "0.0.0.0" # 兜底返回基础地址
+# ================= 本机地址获取部分 =================
+
+
+# ================= 动态画质设置部分 =================
+QUALITY_CONFIG = {
+    # 键为帧率区间元组(左闭右开区间),值为(宽度,高度,JPEG质量,描述)
+    (0, 5): (1280, 720, 10, "垃圾帧率: 1280×720 质量10"), # 当帧率<5时使用720P低画质
+    (5, 10): (1280, 720, 20, "垃圾帧率: 1280×720 质量20"),
+    (10, 15): (1280, 720, 30, "垃圾帧率: 1280×720 质量30"),
+    (15, 20): (1280, 720, 40, "一般帧率: 1280×720 质量40"),
+    (20, 25): (1280, 720, 50, "一般帧率: 1280×720 质量50"),
+    (25, 30): (1280, 720, 60, "一般帧率: 1280×720 质量60"),
+    (30, 35): (1920, 1080, 40, "良好帧率: 1920×1080 质量40"),
+    (35, 40): (1920, 1080, 50, "良好帧率: 1920×1080 质量50"),
+    (40, 45): (1920, 1080, 60, "良好帧率: 1920×1080 质量60"),
+    (45, 50): (1920, 1080, 70, "优秀帧率: 1920×1080 质量70"),
+    (50, 55): (1920, 1080, 80, "优秀帧率: 1920×1080 质量80"),
+    (55, 60): (1920, 1080, 90, "优秀帧率: 1920×1080 质量90"),
+    (60, float('inf')): (1920, 1080, 100, "最高帧率: 1920×1080 质量100") # 帧率≥60时使用1080P最高画质
+}
+QUALITY_ADJUST_INTERVAL = 1 # 调整间隔秒,避免每秒调整多次
+
+
+def parse_quality_config(entries):
+    """把配置文件中的画质档位列表转换为QUALITY_CONFIG的格式
+    每项为{"min_fps": 0, "max_fps": 5, "width": 1280, "height": 720, "quality": 10, "name": "说明"},max_fps为null表示无上限"""
+    ladder = {}
+    for entry in entries:
+        upper = float('inf') if entry.get("max_fps") is None else float(entry["max_fps"])
+        width, height, quality = int(entry["width"]), int(entry["height"]), int(entry["quality"])
+        ladder[(float(entry["min_fps"]), upper)] = (width, height, quality,
+                                                     entry.get("name", f"{width}×{height} 质量{quality}"))
+    if not ladder:
+        raise ValueError("画质档位不能为空")
+    return ladder
+
+
+class VideoQualityManager:
+    def __init__(self):
+        self.current_config = None
+        self.current_config = self.get_config(25) # 默认使用25-30fps档位平衡性能
+        self.last_adjust_time = time.time() # 记录上次调整时间,用于冷却机制
+        self.pinned_config = None # 控制接口固定的档位,设置后不再自动调整
+
+    def get_config(self, current_fps):
+        """根据当前帧率查找对应的画质配置(QUALITY_CONFIG可能被热加载替换,每次都读最新的)"""
+        for fps_range, config in QUALITY_CONFIG.items():
+            if fps_range[0] <= current_fps < fps_range[1]: # 左闭右开区间判断
+                return config # 返回匹配的配置
+        # 未匹配时返回当前配置(防止配置丢失),还没有配置时用第一档
+        return self.current_config or next(iter(QUALITY_CONFIG.values()))
+
+    def adjust_quality(self, current_fps):
+        """带冷却机制的画质调整函数"""
+        if self.pinned_config is not None:
+            self.current_config = self.pinned_config
+            return self.current_config
+        current_time = time.time()
+        if current_time - self.last_adjust_time > QUALITY_ADJUST_INTERVAL: # 冷却时间已过
+            new_config = self.get_config(current_fps) # 获取新配置
+            if new_config != self.current_config: # 配置有变化时更新
+                self.current_config = new_config # 更新当前配置
+                # 打印提示信息，包含新配置描述和当前帧率
+                print(f"画质调整: {new_config[3]} (当前帧率: {current_fps:.1f} FPS)")
+            self.last_adjust_time = current_time # 记录调整时间
+        return self.current_config # 返回当前配置
+# ================= 动态画质设置部分 =================
+
+
+# ================= 屏幕捕捉部分 =================
+# 截图/编码放入有界线程池执行,连接数再多也不会线程爆炸;输入注入由每个会话的注入队列线程执行
+# 截图、缩放、编码函数在capture_process.py中,截图进程与本进程共用
+# 线程池、注入后端在serve()中创建:截图子进程(spawn)会以__mp_main__重新导入本模块,导入时不能有任何副作用
+CAPTURE_WORKERS = 2 # 截图编码线程数上限
+capture_executor = None # 截图编码线程池,serve()启动时创建
+# 启动参数--capture-process:截图编码放到独立进程,经共享内存帧环取回JPEG,不再与输入注入争抢GIL
+CAPTURE_IN_PROCESS = "--capture-process" in sys.argv
+capture_worker = None # 截图进程代理,serve()启动时创建
+INPUT_BACKEND = "auto" # 输入注入后端: auto/native/pyautogui/null,见input_backend.py
+injector = None # 输入注入后端(鼠标瞬间到位,没有补间动画阻塞注入线程),serve()启动时按INPUT_BACKEND创建
+
+
+def warm_up_capture():
+    """在截图线程中预先导入截图模块(cv2/numpy/mss),开始监听后立即执行,第一帧不用等导入"""
+    import capture_process
+
+
+async def encode_frame(width, height, quality, view_size):
+    """截取并编码一帧,返回(JPEG数据, 截图耗时ms, 处理耗时ms, 画面变化比例)
+    截图进程可用时交给它,否则(未开启或进程已退出)在本进程的截图线程池中执行"""
+    import capture_process
+    worker = capture_worker
+    if worker is not None and worker.is_alive():
+        try:
+            return await asyncio.wrap_future(worker.submit(width, height, quality, view_size))
+        except RuntimeError as e:
+            print(f"截图进程编码失败,改用本进程编码: {e}")
+    return await asyncio.get_running_loop().run_in_executor(
+        capture_executor, capture_process.grab_and_encode, width, height, quality, view_size)
+# ================= 屏幕捕捉部分 =================
+
+
+# ================= 输入注入队列部分 =================
+class InjectionQueue:
+    """一个会话的输入注入队列:socket读取协程只负责入队,专用线程按顺序注入,慢的注入调用不会拖住读取
+    连续的绝对移动只保留最新一个;点击、按键、左键按下/松开等事件永远按到达顺序执行,不会被合并或重排"""
+
+    def __init__(self, name):
+        self.cond = threading.Condition()
+        self.items = deque() # 待执行的(合并键, 函数, 参数, 入队时间, 延迟记录)
+        self.closed = False
+        self.executed = 0 # 已执行的事件数
+        self.coalesced = 0 # 被新移动覆盖掉的旧移动数
+        self.max_depth = 0 # 本统计周期内的最大排队长度
+        self.max_age = 0.0 # 本统计周期内事件从入队到开始执行的最长等待(秒)
+        self.thread = threading.Thread(target=self._run, name=f"input-{name}", daemon=True)
+        self.thread.start()
+
+    def put(self, func, *args, coalesce=None, latency=None):
+        """入队一个注入调用,不等待执行
+        coalesce不为None时,若队尾尚未执行的调用合并键相同,直接用本次调用替换它(保留原入队时间,等待时长照实统计)
+        latency为(InputLatencyStats, 事件类型, 客户端发送时间, 服务端收到时间),注入完成后记入延迟统计"""
+        now = time.time()
+        if latency is not None:
+            latency = latency + (now,)
+        with self.cond:
+            if self.closed:
+                return
+            if coalesce is not None and self.items and self.items[-1][0] == coalesce:
+                self.items[-1] = (coalesce, func, args, self.items[-1][3], latency)
+                self.coalesced += 1
+            else:
+                self.items.append((coalesce, func, args, now, latency))
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.items or self.closed)
+                if not self.items: # 已关闭且队列为空
+                    return
+                _, func, args, queued_at, latency = self.items.popleft()
+            start = time.time()
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"注入输入事件时出错: {e}")
+            if latency is not None:
+                stats, event_type, client_time, receive_time, latency_queued = latency
+                stats.record(event_type, client_time, receive_time, latency_queued, start, time.time())
+            age = start - queued_at
+            with self.cond:
+                self.executed += 1
+                self.max_age = max(self.max_age, age)
+
+    def depth(self):
+        return len(self.items)
+
+    def take_stats(self):
+        """返回当前排队长度和本周期的最大排队长度、最长等待(毫秒)、合并数,并开始新的统计周期"""
+        with self.cond:
+            stats = {"depth": len(self.items), "max_depth": self.max_depth,
+                     "max_age_ms": round(self.max_age * 1000, 1), "executed": self.executed,
+                     "coalesced": self.coalesced}
+            self.max_depth = len(self.items)
+            self.max_age = 0.0
+        return stats
+
+    def close(self):
+        """不再接受新事件;已入队的事件(如断线时的按键释放)执行完后线程退出"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def join(self, timeout=None):
+        """close()之后等待已入队的事件执行完、线程退出"""
+        self.thread.join(timeout)
+# ================= 输入注入队列部分 =================
+
+
+# ================= 输入延迟统计部分 =================
+# 客户端给每条鼠标键盘事件带上发送时间ts和序号seq,服务端记录收到、入队、开始注入、注入完成的时间,
+# 按事件类型和阶段统计直方图,定期汇总发回客户端;网络阶段用客户端测得的时钟偏差校正
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000) # 直方图各桶的上限(毫秒),超过1秒的放最后一桶
+LATENCY_STAGES = ("network", "parse", "queue", "inject", "total") # 网络传输、解析、排队、注入、端到端
+LATENCY_REPORT_INTERVAL = 2.0 # 汇总回报间隔(秒)
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图,分位数按桶上限估计"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        rank = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "mean": round(self.total / self.count, 2),
+                "p50": round(self.percentile(0.5), 2), "p95": round(self.percentile(0.95), 2),
+                "max": round(self.max, 2), "buckets": self.counts}
+
+
+class InputLatencyStats:
+    """一个会话的输入延迟统计,注入线程写入,汇总任务读取并清零"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {} # 事件类型 -> {阶段: LatencyHistogram}
+        self.clock_offset = None # 服务端时钟减客户端时钟(秒),由客户端ping测得后告知
+        self.last_seq = 0 # 收到的最大事件序号
+
+    def record(self, event_type, client_time, receive_time, queued_time, start_time, done_time):
+        samples = {"parse": queued_time - receive_time, "queue": start_time - queued_time,
+                   "inject": done_time - start_time}
+        offset = self.clock_offset
+        if client_time is not None and offset is not None: # 没有时钟偏差时只统计服务端内部的阶段
+            samples["network"] = receive_time - offset - client_time
+            samples["total"] = done_time - offset - client_time
+        with self.lock:
+            histograms = self.histograms.setdefault(event_type, {})
+            for stage, seconds in samples.items():
+                histograms.setdefault(stage, LatencyHistogram()).add(max(0.0, seconds * 1000))
+
+    def take_summary(self):
+        """返回{事件类型: {阶段: 统计}}并开始新的统计周期,没有事件时返回空字典"""
+        with self.lock:
+            histograms, self.histograms = self.histograms, {}
+        return {event_type: {stage: stages[stage].summary() for stage in LATENCY_STAGES if stage in stages}
+                for event_type, stages in histograms.items()}
+
+
+def event_timing(session, event, receive_time):
+    """从客户端事件取出时间戳和序号,生成注入队列的latency参数;旧客户端不带ts时只统计服务端阶段"""
+    stats = session.input_latency
+    seq = event.get("seq")
+    if isinstance(seq, int) and seq > stats.last_seq:
+        stats.last_seq = seq
+    client_time = event.get("ts")
+    return stats, event.get("type"), client_time if isinstance(client_time, (int, float)) else None, receive_time
+
+
+def handle_latency_ping(session, message, receive_time):
+    """回应客户端的时钟同步ping,并记下客户端上次测得的时钟偏差"""
+    offset = message.get("offset")
+    if isinstance(offset, (int, float)):
+        session.input_latency.clock_offset = offset
+    session.send_control({"type": "pong", "t0": message.get("t0"), "t1": receive_time, "t2": time.time()})
+
+
+async def report_input_latency(session):
+    """定期把输入延迟汇总发给客户端并打印"""
+    while True:
+        await asyncio.sleep(LATENCY_REPORT_INTERVAL)
+        summary = session.input_latency.take_summary()
+        if not summary:
+            continue
+        session.send_control({"type": "input_latency", "events": summary, "seq": session.input_latency.last_seq})
+        for event_type, stages in summary.items():
+            parts = " ".join(f"{stage} {stats['p50']:.1f}/{stats['p95']:.1f}" for stage, stats in stages.items())
+            print(f"[输入延迟 {event_type}] 次数: {stages['inject']['count']} P50/P95(ms): {parts}")
+# ================= 输入延迟统计部分 =================
+
+
+# ================= 会话恢复部分 =================
+# 客户端第一次连接鼠标通道时由服务端分配会话令牌,断线重连时三个通道都带上令牌找回原来的会话状态
+SESSION_GRACE = 30.0 # 所有通道都断开后会话保留的宽限时间(秒)
+SESSION_HELLO_TIMEOUT = 1.0 # 等待连接上第一行会话握手的时间,超时按不带令牌的旧客户端处理
+sessions = {} # 会话令牌 -> RemoteSession
+
+
+class RemoteSession:
+    """一个客户端的会话:画质档位、窗口尺寸、鼠标状态在重连后沿用,不必重新协商"""
+
+    def __init__(self):
+        self.token = secrets.token_hex(16) # 随机令牌,无法被其他客户端猜到
+        self.quality_manager = VideoQualityManager() # 重连后沿用断线前的画质档位
+        self.view_size = None # 客户端窗口尺寸,重连后第一帧就按该尺寸编码
+        self.mouse_state = {"x": 0, "y": 0, "is_down": False} # 当前鼠标绝对坐标和左键状态
+        self.channels = {} # 通道名 -> 正在服务该通道的协程任务
+        self.expire_handle = None # 宽限计时器
+        self.control_writer = None # 鼠标通道的写端,服务端经它向客户端发送控制消息(光标位置、画质统计)
+        self.input_queue = InjectionQueue(self.token[:8]) # 鼠标和键盘共用,两个通道之间的事件顺序也不变
+        self.input_latency = InputLatencyStats() # 输入延迟直方图和客户端时钟偏差
+        self.addresses = {} # 通道名 -> 客户端地址
+        self.max_fps = None # 控制接口设置的帧率上限,None时只受MAX_FPS限制
+        self.video_stats = {"fps": 0, "bytes_per_sec": 0, "total_bytes": 0, "dropped": 0} # 最近一秒的推流统计
+        self.wakeup = asyncio.Event() # 唤醒正在等待下一帧的推流循环
+        self.refresh_requested = False # 下一帧不等帧间隔立即发送
+        self.last_input_time = time.time() # 最近一次收到鼠标或键盘输入的时间,空闲降帧据此判断
+        self.idle = False # 推流循环是否处于空闲降帧状态
+        self.allow_idle = True # 客户端在握手中带"idle": false时不降帧(压测要测满帧率时的承载能力)
+
+    def attach(self, channel, address=None):
+        """当前协程接管一个通道;同一通道的旧连接(断网时可能还没发现已断开)直接取消"""
+        task = asyncio.current_task()
+        old_task = self.channels.get(channel)
+        if old_task is not None and old_task is not task and not old_task.done():
+            old_task.cancel()
+        self.channels[channel] = task
+        self.addresses[channel] = address
+        if self.expire_handle is not None: # 宽限期内重连,取消过期计时
+            self.expire_handle.cancel()
+            self.expire_handle = None
+
+    def detach(self, channel):
+        """通道连接结束;所有通道都断开后开始宽限计时"""
+        if self.channels.get(channel) is asyncio.current_task(): # 已被新连接接管时不用移除
+            del self.channels[channel]
+        if not self.channels and self.expire_handle is None and sessions.get(self.token) is self:
+            self.expire_handle = asyncio.get_running_loop().call_later(SESSION_GRACE, self.expire)
+
+    def send_control(self, message):
+        """向客户端发送一条控制消息(每行一条JSON),鼠标通道未连接时直接丢弃"""
+        writer = self.control_writer
+        if writer is None or writer.is_closing():
+            return
+        writer.write(json.dumps(message).encode('utf-8') + b'\n')
+
+    def expire(self):
+        """宽限期内没有重连,丢弃会话并释放断线时仍按着的鼠标左键"""
+        sessions.pop(self.token, None)
+        print(f"会话 {self.token[:8]} 已过期")
+        if self.mouse_state["is_down"]:
+            self.mouse_state["is_down"] = False
+            self.input_queue.put(injector.button, 'left', False)
+        self.input_queue.close()
+
+    def note_input(self):
+        """收到鼠标或键盘输入;正在空闲降帧时唤醒推流循环,下一帧就恢复全帧率"""
+        self.last_input_time = time.time()
+        if self.idle:
+            self.wakeup.set()
+
+    def request_refresh(self):
+        """立即推送一帧完整画面,不等帧间隔"""
+        self.refresh_requested = True
+        self.wakeup.set()
+
+    async def disconnect(self):
+        """断开所有通道并立即作废会话(不保留宽限期),客户端重连时会得到新会话"""
+        tasks = [task for task in self.channels.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks: # 等各通道的清理(释放按键等)入队之后再关闭注入队列
+            await asyncio.wait(tasks)
+        if self.expire_handle is not None:
+            self.expire_handle.cancel()
+            self.expire_handle = None
+        if sessions.get(self.token) is self:
+            self.expire()
+
+
+async def read_session_hello(reader):
+    """读取连接上的第一行,客户端会先发{"type": "hello", "session": 令牌}
+    返回(握手消息, None);旧客户端不发握手,超时返回(None, None),第一行不是握手时返回(None, 该行)交给调用方处理"""
+    try:
+        line = await asyncio.wait_for(reader.readline(), SESSION_HELLO_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None, None
+    try:
+        message = json.loads(line)
+        if isinstance(message, dict) and message.get("type") == "hello":
+            return message, None
+    except ValueError:
+        pass
+    return None, line
+
+
+def find_session(hello):
+    """按握手中的令牌查找会话,找不到(没带令牌或已过期)时返回None"""
+    if hello is None:
+        return None
+    return sessions.get(hello.get("session"))
+
+
+def has_live_channel(session, channel):
+    """会话在该通道上是否还有旧连接(断网后服务端可能还没发现),恢复会话的新连接会顶替它"""
+    task = session.channels.get(channel) if session is not None else None
+    return task is not None and not task.done()
+# ================= 会话恢复部分 =================
+
+
+# ================= 视频流处理协程 =================
+MAX_FPS = 60 # 目标最大帧率,限制发送速度;每帧重新读取,热加载后立即生效
+# 空闲降帧:没有输入且画面几乎不变时降到IDLE_FPS,有输入或画面变化时下一帧恢复全帧率
+IDLE_FPS = 2 # 空闲时的帧率,设为null关闭
+MIN_FPS = 1.0 # 帧率设置的下限:客户端3秒收不到帧会认为断线并重连,更低的帧率会让客户端反复重连
+IDLE_TIMEOUT = 3.0 # 没有输入且画面没有变化多久后进入空闲(秒)
+SCREEN_CHANGE_THRESHOLD = 0.002 # 变化的采样点超过该比例才算画面有变化,闪烁的光标、时钟不算
+last_screen_change = time.time() # 最近一次检测到画面变化的时间,屏幕只有一块,所有会话共用
+_cpu_sample = [time.time(), time.process_time(), 0.0] # 上次采样的(墙钟时间, 进程CPU时间, CPU占用%)
+
+
+def process_cpu_percent():
+    """服务端进程的CPU占用(%,多核累加可超过100),每秒最多采样一次,所有连接共用"""
+    now = time.time()
+    last_wall, last_cpu, percent = _cpu_sample
+    if now - last_wall >= 1.0:
+        cpu = time.process_time() # 进程内所有线程的CPU时间
+        percent = (cpu - last_cpu) / (now - last_wall) * 100
+        _cpu_sample[:] = [now, cpu, percent]
+    return percent
+
+
+def update_idle(session, now):
+    """判断会话是否进入或离开空闲,状态变化时打印当时的进程CPU占用,便于对比降帧前后的开销"""
+    idle = (session.allow_idle and IDLE_FPS is not None and now - session.last_input_time > IDLE_TIMEOUT
+            and now - last_screen_change > IDLE_TIMEOUT)
+    if idle != session.idle:
+        session.idle = idle
+        state = f"进入空闲,帧率降至 {IDLE_FPS:g} FPS" if idle else "恢复全帧率"
+        print(f"会话 {session.token[:8]} {state} (此前进程CPU: {process_cpu_percent():.1f}%)")
+        if not idle: # 空闲期间帧数很少,重新计冷却,不按空闲时的帧数调整画质
+            session.quality_manager.last_adjust_time = now
+    return idle
+
+
+async def stream_video(client_address, sink, session=None):
+    """视频推流主循环(TCP与UDP共用),截图编码在线程池中执行,sink负责把最新一帧发给客户端,发送永远不会阻塞截图
+    session是客户端恢复的会话,画质档位沿用会话中的状态;只有带会话的客户端才会空闲降帧(旧客户端的输入无法关联)"""
+    global last_screen_change
+    try:
+        print(f"开始处理客户端 {client_address} 的视频请求")
+        last_frame_time = 0.0 # 记录上次发送帧的时间戳,第一帧立即发送
+        bytes_count = 0 # 每秒编码输出的字节数
+
+        last_second = int(time.time()) # 性能统计的时间戳
+        capture_count = 0 # 每秒捕获的帧数统计
+        process_count = 0 # 每秒处理的帧数统计
+        process_time_sum = 0.0 # 处理耗时总和
+        send_count = 0 # 发送帧数统计
+        sent_base = sink.sent_count # 本秒开始时已真正发出的帧数
+        dropped_base = sink.dropped_count # 本秒开始时已被替换丢弃的帧数
+
+        if session is not None:
+            quality_manager = session.quality_manager # 沿用断线前的画质档位
+            quality_manager.last_adjust_time = time.time() # 重新计冷却,避免按刚连上时的0帧率降档
+        else:
+            quality_manager = VideoQualityManager() # 初始化画质管理器
+
+        while True:
+            if not sink.is_alive(): # TCP看发送任务是否出错,UDP看保活是否超时
+                print(f"客户端 {client_address} 主动断开连接")
+                break
+
+            now = time.time()
+            elapsed = now - last_frame_time # 距离上次发送的时间差
+            fps_limit = MAX_FPS if session is None or session.max_fps is None else min(MAX_FPS, session.max_fps)
+            idle = session is not None and update_idle(session, now)
+            if idle:
+                fps_limit = min(fps_limit, IDLE_FPS)
+            frame_interval = 1.0 / fps_limit # 每帧间隔时间
+            refresh = session is not None and session.refresh_requested # 控制接口要求立即刷新
+            if elapsed < frame_interval and not refresh: # 控制帧率:不足一帧间隔时让出事件循环
+                await wait_next_frame(session, frame_interval - elapsed)
+                continue
+            last_frame_time = now # 更新上次发送时间
+            if refresh:
+                session.refresh_requested = False
+
+            current_second = int(now) # 每秒统计一次性能数据
+            if current_second > last_second:
+                if session is not None: # 当前画质档位和输入排队情况回报给客户端,显示在性能浮层上
+                    session.video_stats.update(fps=sink.sent_count - sent_base, bytes_per_sec=bytes_count,
+                                               dropped=sink.dropped_count - dropped_base)
+                    tier_width, tier_height, tier_quality, _ = quality_manager.current_config
+                    input_stats = session.input_queue.take_stats()
+                    session.send_control({"type": "video_stats", "tier_width": tier_width,
+                                          "tier_height": tier_height, "quality": tier_quality,
+                                          "fps": sink.sent_count - sent_base,
+                                          "cpu": round(process_cpu_percent(), 1),
+                                          "input_depth": input_stats["max_depth"],
+                                          "input_age_ms": input_stats["max_age_ms"], "idle": session.idle})
+                    print(f"[输入队列] 排队: {input_stats['depth']} "
+                          f"最大排队: {input_stats['max_depth']} "
+                          f"最长等待: {input_stats['max_age_ms']:.1f}ms "
+                          f"累计合并移动: {input_stats['coalesced']}")
+                print(f"\n[统计 {last_second}s-{current_second - 1}s] "
+                      f"截取帧数: {capture_count} "
+                      f"处理帧数: {process_count} "
+                      f"处理耗时: {process_time_sum:.1f}ms "
+                      f"发送帧数: {send_count} "
+                      f"丢弃帧数: {sink.dropped_count - dropped_base} ")
+                # 重置统计变量
+                capture_count = 0
+                process_count = 0
+                process_time_sum = 0.0
+                send_count = 0
+                bytes_count = 0
+                sent_base = sink.sent_count
+                dropped_base = sink.dropped_count
+                last_second = current_second
+
+            if session is not None: # 窗口尺寸随时记到会话里,重连的新连接第一帧就能用上
+                session.view_size = sink.view_size
+
+            # 使用本秒真正发出的帧数近似当前帧率,链路慢时自动降档
+            # 会话被限速时按达到上限的比例折算,避免因为人为限速而降档;空闲降帧时保持当前档位不调整
+            send_count = sink.sent_count - sent_base
+            if idle:
+                width, height, quality, _ = quality_manager.current_config
+            else:
+                width, height, quality, _ = quality_manager.adjust_quality(send_count * MAX_FPS / fps_limit)
+            # 截图+缩放+编码都是阻塞操作,交给截图进程或有界线程池,事件循环继续服务其他连接
+            data, capture_time, process_time, change = await encode_frame(width, height, quality, sink.view_size)
+            if change > SCREEN_CHANGE_THRESHOLD: # 画面在变化(播放视频、窗口动画等),所有会话保持全帧率
+                last_screen_change = time.time()
+            capture_count += 1 # 统计捕获次数
+            process_count += 1 # 统计处理次数
+            process_time_sum += process_time # 累计处理耗时
+            bytes_count += len(data)
+            if session is not None:
+                session.video_stats["total_bytes"] += len(data)
+
+            # 网络发送阶段
+            try:
+                sink.submit(data) # 只提交不等待,链路慢时未开始发送的旧帧会被这一帧替换
+            except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+                # 客户端主动断开连接时捕获异常
+                print(f"客户端 {client_address} 主动断开连接")
+                break # 跳出循环，关闭连接
+
+            # 实时状态输出
+            print(f"[实时] 捕获: {capture_time:.1f}ms "
+                  f"处理: {process_time:.1f}ms "
+                  f"队列延迟: {elapsed * 1000:.1f}ms")
+
+    except Exception as e: # 捕获协程内所有异常(取消异常CancelledError不在此列)
+        print(f"处理客户端 {client_address} 时出错: {e}")
+        traceback.print_exc() # 打印详细异常栈,包含代码行号
+
+
+async def wait_next_frame(session, delay):
+    """等到下一帧的时间;会话被唤醒(如控制接口要求刷新)时提前返回"""
+    if session is None:
+        await asyncio.sleep(delay)
+        return
+    try:
+        await asyncio.wait_for(session.wakeup.wait(), delay)
+    except asyncio.TimeoutError:
+        pass
+    session.wakeup.clear()
+
+
+# 视频连接的内核发送缓冲上限;TCP_NOTSENT_LOWAT进一步限制内核中尚未发出的字节数
+VIDEO_SNDBUF = 256 * 1024
+VIDEO_NOTSENT_LOWAT = 16 * 1024
+VIDEO_WRITE_TIMEOUT = 10.0 # 一帧这么久还没交给内核,说明客户端已失联或不再读取,断开连接(秒)
+# TCP保活:连接空闲KEEPALIVE_IDLE秒后每KEEPALIVE_INTERVAL秒探测一次,连续无应答时内核断开连接
+# 客户端断电、断网时读取方(键盘通道可能很久没有数据)也能收到错误,连接不会一直挂着
+KEEPALIVE_IDLE = 10
+KEEPALIVE_INTERVAL = 2
+KEEPALIVE_COUNT = 5 # Windows固定为10次,不可设置
+
+
+def enable_keepalive(sock):
+    """开启TCP保活并缩短探测时间(系统默认空闲2小时才开始探测)"""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (("TCP_KEEPIDLE", KEEPALIVE_IDLE), ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+                          ("TCP_KEEPCNT", KEEPALIVE_COUNT)):
+        if hasattr(socket, option): # 较旧的Windows没有这些选项,只能用系统默认的探测时间
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+            except OSError:
+                pass
+
+
+def tune_video_socket(sock):
+    """限制视频连接在内核中排队的数据量,慢客户端也不会看到几秒前的画面"""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, VIDEO_SNDBUF) # 发送缓冲上限
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # 帧尾的小分段立即发出
+    enable_keepalive(sock)
+    notsent_lowat = getattr(socket, "TCP_NOTSENT_LOWAT", None) # Linux/macOS才有,Windows上只靠SO_SNDBUF
+    if notsent_lowat is not None:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, notsent_lowat, VIDEO_NOTSENT_LOWAT)
+        except OSError:
+            pass
+
+
+def tune_input_socket(sock):
+    """鼠标键盘指令都是小包,关闭Nagle算法避免攒包延迟"""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    enable_keepalive(sock)
+
+
+class LatestFrameSender:
+    """最新帧优先的TCP视频发送器:同一时刻只有一帧在发送,尚未开始发送的旧帧会被新帧替换"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = None # 等待发送的最新一帧
+        self.ready = asyncio.Event() # 有新帧时唤醒发送任务
+        self.sent_count = 0 # 真正发出的帧数
+        self.dropped_count = 0 # 还没开始发送就被新帧替换的帧数
+        self.view_size = None # 客户端回报的窗口尺寸(宽, 高)
+        self.closed = False
+        # 高水位为0:上一帧全部交给内核后drain才返回,用户态缓冲不会积压帧
+        writer.transport.set_write_buffer_limits(high=0)
+        self.task = asyncio.ensure_future(self._run())
+
+    def submit(self, data):
+        """提交一帧,不等待发送完成"""
+        if self.closed:
+            raise ConnectionResetError("视频连接已断开")
+        if self.pending is not None: # 上一帧还没开始发送,直接被替换
+            self.dropped_count += 1
+        self.pending = data
+        self.ready.set()
+
+    def is_alive(self):
+        return not self.closed
+
+    async def _run(self):
+        """发送任务:每次取最新一帧发送,drain()等待它完全交给内核,超过VIDEO_WRITE_TIMEOUT时断开"""
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                data, self.pending = self.pending, None
+                self.writer.write(len(data).to_bytes(4, byteorder='big')) # 4字节大端序尺寸信息
+                self.writer.write(data) # 图像数据
+                await asyncio.wait_for(self.writer.drain(), VIDEO_WRITE_TIMEOUT)
+                self.sent_count += 1
+        except asyncio.TimeoutError:
+            print(f"视频帧 {VIDEO_WRITE_TIMEOUT:g} 秒未能发出,断开客户端 {self.writer.get_extra_info('peername')}")
+            self.writer.transport.abort() # 发送缓冲里还有数据,close()会一直等它发完
+        except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+            pass # 客户端断开,由推流循环检测is_alive()后退出
+        finally:
+            self.closed = True
+
+    def close(self):
+        self.task.cancel()
+
+
+def apply_view_size(line, sender):
+    """解析一行窗口尺寸消息并记到发送器上"""
+    try:
+        message = json.loads(line)
+        if message.get("type") == "view_size":
+            sender.view_size = (int(message["width"]), int(message["height"]))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        print("收到无效的窗口尺寸数据")
+
+
+async def read_view_size(reader, sender):
+    """读取客户端在视频连接上回传的窗口尺寸(每行一条JSON),服务端按该尺寸编码"""
+    while True:
+        line = await reader.readline()
+        if not line: # 客户端关闭了连接
+            break
+        apply_view_size(line, sender)
+
+
+async def handle_video_client(reader, writer, greeting=None):
+    """处理TCP视频流客户端的协程,greeting为track_connection已读取的握手结果"""
+    client_address = writer.get_extra_info('peername') # 客户端地址
+    tune_video_socket(writer.get_extra_info('socket'))
+    hello, first_line = greeting or await read_session_hello(reader)
+    session = find_session(hello)
+    sender = LatestFrameSender(writer)
+    if session is not None:
+        session.attach("video", client_address)
+        sender.view_size = session.view_size # 恢复的会话不必等客户端重新回报窗口尺寸
+    elif first_line:
+        apply_view_size(first_line, sender)
+    view_size_task = asyncio.ensure_future(read_view_size(reader, sender)) # 视频连接的上行方向只用来回报窗口尺寸
+
+    try:
+        await stream_video(client_address, sender, session)
+    finally:
+        view_size_task.cancel()
+        sender.close()
+        writer.close() # 确保关闭客户端连接,释放资源
+        if session is not None:
+            session.detach("video")
+        print(f"客户端 {client_address} 视频连接已关闭")
+
+
+async def handle_udp_video_client(udp_session):
+    """处理UDP视频会话的协程:帧被切成MTU大小的分片发送,丢失的分片由客户端NACK请求重传"""
+    session = sessions.get(udp_session.token) # HELLO包中携带的会话令牌
+    if session is not None:
+        session.attach("video", udp_session.address)
+        if udp_session.view_size is None:
+            udp_session.view_size = session.view_size
+    try:
+        await stream_video(udp_session.address, udp_session, session) # UDP发送不阻塞,也没有队头阻塞
+    finally:
+        udp_session.close()
+        if session is not None:
+            session.detach("video")
+        print(f"客户端 {udp_session.address} UDP视频连接已关闭")
+# ================= 视频流处理协程 =================
+
+
+# ================= 鼠标控制处理协程 =================
+def inject_mouse_event(mouse_event, state, screen_width, screen_height):
+    """在会话的注入队列线程中执行一条鼠标事件,state保存当前坐标和左键按下状态"""
+    # 客户端发送的x/y是0-1之间的相对坐标,转换为绝对坐标
+    abs_x = int(mouse_event["x"] * screen_width)
+    abs_y = int(mouse_event["y"] * screen_height)
+
+    if mouse_event["type"] == "move":  # 鼠标移动事件
+        # 若坐标有变化,直接移动到目标位置(不做补间动画,不阻塞后续事件)
+        if abs_x != state["x"] or abs_y != state["y"]:
+            injector.move(abs_x, abs_y)
+            state["x"], state["y"] = abs_x, abs_y # 更新当前坐标
+        # 处理鼠标按下状态,与客户端同步
+        if mouse_event.get("is_down", False) != state["is_down"]:
+            state["is_down"] = mouse_event["is_down"]
+            injector.button('left', state["is_down"]) # 按下或释放左键
+    elif mouse_event["type"] == "left_click":
+        injector.click('left')
+    elif mouse_event["type"] == "right_click":
+        injector.click('right')
+    elif mouse_event["type"] == "left_double_click":
+        injector.click('left', clicks=2)
+    elif mouse_event["type"] == "wheel":
+        direction = mouse_event["direction"]
+        scroll_delta = 100 if direction == "up" else -100
+        injector.scroll(scroll_delta)
+        print(f"执行滚轮操作: {direction}")
+    elif mouse_event["type"] == "hwheel":
+        direction = mouse_event["direction"]
+        injector.hscroll(100 if direction == "right" else -100)
+        print(f"执行水平滚轮操作: {direction}")
+
+    print(f"执行鼠标操作: {mouse_event['type']} 在坐标 ({abs_x}, {abs_y})")
+
+
+CURSOR_REPORT_INTERVAL = 0.05 # 回报真实鼠标位置的检查间隔(秒)
+MOUSE_READ_TIMEOUT = 15.0 # 带会话的客户端每2秒发一次ping,鼠标通道这么久没有任何数据说明客户端已失联(秒)
+
+
+async def report_cursor(writer, screen_width, screen_height):
+    """鼠标位置变化时回报给客户端(0-1相对坐标),客户端据此校正本地绘制的光标"""
+    last_position = None
+    try:
+        while True:
+            await asyncio.sleep(CURSOR_REPORT_INTERVAL)
+            position = injector.position() # 服务端真实的鼠标位置,远程程序也可能移动它
+            if position == last_position:
+                continue
+            last_position = position
+            message = {"type": "cursor", "x": position[0] / screen_width, "y": position[1] / screen_height}
+            writer.write(json.dumps(message).encode('utf-8') + b'\n')
+            await writer.drain()
+    except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+        pass # 连接断开由鼠标指令读取循环处理
+
+
+async def handle_mouse_client(reader, writer, greeting=None):
+    """处理鼠标控制客户端的协程,greeting为track_connection已读取的握手结果"""
+    client_address = writer.get_extra_info('peername')
+    session = None
+    report_task = None
+    latency_task = None
+    try:
+        print(f"开始处理客户端 {client_address} 的鼠标控制请求")
+        tune_input_socket(writer.get_extra_info('socket')) # 关闭Nagle算法
+
+        # 鼠标通道负责会话握手:带着有效令牌时恢复原会话,否则分配新会话并把令牌回给客户端
+        hello, pending_line = greeting or await read_session_hello(reader)
+        session = find_session(hello)
+        resumed = session is not None
+        if session is None:
+            if len(sessions) >= MAX_SESSIONS: # 每个会话有一个注入线程,重连风暴时也不能无限增长
+                print(f"会话数已达上限({MAX_SESSIONS}),拒绝客户端 {client_address}")
+                await reject_connection(writer, "busy", f"服务端会话数已满({MAX_SESSIONS}),请稍后重试")
+                return
+            session = RemoteSession()
+            sessions[session.token] = session
+        session.attach("mouse", client_address)
+        if hello is not None:
+            session.allow_idle = hello.get("idle", True) is not False
+            reply = {"type": "session", "token": session.token, "resumed": resumed}
+            writer.write(json.dumps(reply).encode('utf-8') + b'\n')
+            await writer.drain()
+            print(f"客户端 {client_address} {'恢复' if resumed else '新建'}会话 {session.token[:8]}")
+
+        screen_width, screen_height = injector.screen_size() # 获取当前屏幕分辨率,宽度,高度
+        state = session.mouse_state # 当前鼠标绝对坐标和左键状态,重连后沿用
+        if hello is not None: # 旧客户端不读取鼠标通道,不给它回报位置和统计
+            session.control_writer = writer
+            report_task = asyncio.ensure_future(report_cursor(writer, screen_width, screen_height))
+            latency_task = asyncio.ensure_future(report_input_latency(session))
+            if CLIENT_MOUSE_MOVE_THROTTLE is not None: # 服务端配置了客户端限频时下发给客户端
+                session.send_control({"type": "config", "mouse_move_throttle": CLIENT_MOUSE_MOVE_THROTTLE})
+
+        while True:
+            # 按行读取,每行一条JSON指令,不会被recv的边界截断
+            if pending_line is not None: # 旧客户端没有握手,第一行就是鼠标指令
+                line, pending_line = pending_line, None
+            elif hello is not None:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), MOUSE_READ_TIMEOUT)
+                except asyncio.TimeoutError:
+                    print(f"客户端 {client_address} {MOUSE_READ_TIMEOUT:g} 秒没有发送任何数据,断开连接")
+                    break
+            else: # 旧客户端不发ping,只能靠TCP保活发现断线
+                line = await reader.readline()
+            if not line:  # 客户端断开连接时返回空字节
+                break
+            receive_time = time.time() # 收到时间,用于输入延迟统计
+            message = line.decode('utf-8').strip()
+            if not message: # 跳过空消息
+                continue
+            try:
+                mouse_event = json.loads(message) # 解析JSON指令
+                if mouse_event["type"] == "ping": # 时钟同步,不是鼠标指令
+                    handle_latency_ping(session, mouse_event, receive_time)
+                    continue
+                session.note_input()
+                # 只入队不等待注入完成;连续的移动(左键状态相同)合并为最新一个,其他事件按顺序执行
+                coalesce = ("move", mouse_event.get("is_down", False)) if mouse_event["type"] == "move" else None
+                session.input_queue.put(inject_mouse_event, mouse_event, state, screen_width, screen_height,
+                                        coalesce=coalesce, latency=event_timing(session, mouse_event, receive_time))
+            except json.JSONDecodeError: # 处理无效JSON数据
+                print("收到无效的JSON数据")
+            except Exception as e: # 捕获其他异常
+                print(f"处理鼠标事件时出错: {e}")
+
+    except Exception as e:
+        print(f"处理客户端 {client_address} 鼠标控制时出错: {e}")
+    finally:
+        if report_task is not None:
+            report_task.cancel()
+            latency_task.cancel()
+        if session is not None:
+            if session.control_writer is writer:
+                session.control_writer = None
+            session.detach("mouse") # 左键状态留在会话里,宽限期过后仍未重连才释放
+        writer.close()
+        print(f"客户端 {client_address} 鼠标控制连接已关闭")
+# ================= 鼠标控制处理协程 =================
+
+
+# ================= 键盘控制处理协程 =================
+# 特殊按键映射表:将客户端发送的按键名称转换为keyboard库识别的名称
+SPECIAL_KEYS = {
+    'space': ' ', 'enter': 'enter', 'backspace': 'backspace',
+    'delete': 'delete', 'tab': 'tab', 'escape': 'esc',
+    'up': 'up', 'down': 'down', 'left': 'left', 'right': 'right',
+    'shift': 'shift', 'ctrl': 'ctrl', 'alt': 'alt', 'caps_lock': 'caps_lock',
+    'f1': 'f1', 'f2': 'f2', 'f3': 'f3', 'f4': 'f4',
+    'f5': 'f5', 'f6': 'f6', 'f7': 'f7', 'f8': 'f8',
+    'f9': 'f9', 'f10': 'f10', 'f11': 'f11', 'f12': 'f12'
+}
+
+
+KEY_REPEAT_DELAY = 0.5 # 按住多久后开始重复(秒)
+KEY_REPEAT_INTERVAL = 0.1 # 重复间隔(秒),即每秒重复10次
+
+
+class TimerHeap:
+    """最小堆定时器:一个线程按到期时间依次执行回调,不依赖socket上有没有数据到达"""
+
+    def __init__(self, name):
+        self.cond = threading.Condition()
+        self.heap = [] # (到期时间, 序号, 回调, 位置参数, 关键字参数)
+        self.counter = itertools.count() # 到期时间相同时按加入顺序执行
+        self.name = name
+        self.thread = None # 第一次加入定时任务时才启动,只导入本模块的进程不会多出线程
+
+    def call_at(self, due, callback, *args, **kwargs):
+        """在time.monotonic()到达due时于定时器线程中执行callback(*args, **kwargs)"""
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.thread.start()
+            heapq.heappush(self.heap, (due, next(self.counter), callback, args, kwargs))
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    wait = self.heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        _, _, callback, args, kwargs = heapq.heappop(self.heap)
+                        break
+                    self.cond.wait(wait)
+            try:
+                callback(*args, **kwargs)
+            except Exception as e:
+                print(f"执行定时任务时出错: {e}")
+
+
+key_repeat_timer = TimerHeap("key-repeat") # 所有会话共用一个按键重复定时线程
+
+
+def schedule_key_repeat(input_queue, pressed_keys, key, press_id, due):
+    """到期时把一次重复按下放进会话的注入队列,保证与key_up的先后顺序"""
+    key_repeat_timer.call_at(due, input_queue.put, repeat_key, input_queue, pressed_keys, key, press_id, due,
+                             coalesce=("repeat", key)) # 队列积压时多次重复合并为一次
+
+
+def repeat_key(input_queue, pressed_keys, key, press_id, due):
+    """在注入队列线程中重复按下仍按住的按键,并安排下一次重复
+    和操作系统一样只重复最后按下的键;该键已松开或被再次按下(press_id不同)时本次重复作废"""
+    if pressed_keys.get(key) is not press_id or next(reversed(pressed_keys)) != key:
+        return
+    injector.key(key, True)
+    # 下一次按固定节拍计算,不因注入耗时而漂移;落后太多时从当前时间重新计
+    due = max(due + KEY_REPEAT_INTERVAL, time.monotonic())
+    schedule_key_repeat(input_queue, pressed_keys, key, press_id, due)
+
+
+def release_keys(pressed_keys):
+    """释放所有已按下的按键并清空按键状态"""
+    for key in list(pressed_keys.keys()):
+        injector.key(key, False)
+    pressed_keys.clear()
+
+
+def inject_key_event(key_event, pressed_keys, input_queue):
+    """在注入队列线程中执行一条键盘事件;按住不放的重复由定时器产生,客户端不再转发系统的重复按下"""
+    if key_event.get("type") == "focus_lost": # 窗口失去焦点事件,释放所有已按下的按键
+        release_keys(pressed_keys)
+        return
+
+    key_name = key_event["name"] # 按键名称(如'enter','a')
+    event_type = key_event["type"] # 事件类型('key_down'或'key_up')
+    # 查找特殊按键映射,若无则使用原始名称
+    key_to_press = SPECIAL_KEYS.get(key_name, key_name)
+
+    if event_type == "key_down": # 按键按下事件
+        if key_to_press not in pressed_keys: # 避免重复按下(旧客户端仍会转发系统的重复按下)
+            injector.key(key_to_press, True) # 模拟按键按下
+            press_id = pressed_keys[key_to_press] = object() # 本次按下的标识,松开后再按是新的标识
+            schedule_key_repeat(input_queue, pressed_keys, key_to_press, press_id,
+                                time.monotonic() + KEY_REPEAT_DELAY)
+    elif event_type == "key_up": # 按键释放事件
+        if key_to_press in pressed_keys: # 避免释放未按下的按键
+            injector.key(key_to_press, False) # 模拟按键释放
+            del pressed_keys[key_to_press] # 从字典中移除,尚未执行的重复随之作废
+
+
+async def handle_keyboard_client(reader, writer, greeting=None):
+    """处理键盘控制客户端的协程,greeting为track_connection已读取的握手结果"""
+    client_address = writer.get_extra_info('peername')
+    pressed_keys = {} # 按下的按键 -> 本次按下的标识,按按下顺序排列,只在注入线程中读写
+    session = None
+    input_queue = None
+
+    try:
+        print(f"开始处理客户端 {client_address} 的键盘控制请求")
+        tune_input_socket(writer.get_extra_info('socket')) # 关闭Nagle算法
+        hello, pending_line = greeting or await read_session_hello(reader)
+        session = find_session(hello)
+        if session is not None:
+            session.attach("keyboard", client_address)
+            input_queue = session.input_queue # 与鼠标共用队列,Ctrl+点击等组合操作的顺序不会错乱
+        else:
+            input_queue = InjectionQueue(f"keyboard-{client_address[1]}") # 没有会话的旧客户端单独一个队列
+        if hello is not None: # 回一行确认,客户端读到它(而不是{"type": "error"})才算键盘通道连接成功
+            writer.write(json.dumps({"type": "ready", "resumed": session is not None}).encode('utf-8') + b'\n')
+            await writer.drain()
+
+        while True:
+            if pending_line is not None: # 旧客户端没有握手,第一行就是键盘指令
+                line, pending_line = pending_line, None
+            else:
+                line = await reader.readline() # 按行读取键盘指令
+            if not line:
+                break
+            receive_time = time.time()
+            message = line.decode('utf-8').strip()
+            if not message:
+                continue
+            try:
+                key_event = json.loads(message) # 解析JSON指令
+                latency = None
+                if session is not None:
+                    session.note_input()
+                    latency = event_timing(session, key_event, receive_time)
+                input_queue.put(inject_key_event, key_event, pressed_keys, input_queue, latency=latency) # 按键事件从不合并
+            except Exception as e:
+                print(f"处理键盘事件时出错: {e}")
+
+    except Exception as e: # 捕获协程内异常
+        print(f"处理客户端 {client_address} 键盘控制时出错: {e}")
+    finally:
+        # 确保释放所有残留按键(断线期间松开的键收不到key_up,不能留到重连之后),排在已入队的事件之后执行
+        if input_queue is not None:
+            input_queue.put(release_keys, pressed_keys)
+            if session is None:
+                input_queue.close()
+        if session is not None:
+            session.detach("keyboard")
+        writer.close() # 关闭连接
+        print(f"客户端 {client_address} 键盘控制连接已关闭")
+# ================= 键盘控制处理协程 =================
+
+
+# ================= 本地控制接口部分 =================
+# 只监听本机回环地址的控制端口,每行一条JSON命令,每条回一行JSON结果,例如:
+#   {"cmd": "list"}                                   列出所有会话
+#   {"cmd": "pin", "session": "ab12cd34", "tier": 3}  固定画质档位(档位序号或[宽,高,质量]),null取消固定
+#   {"cmd": "cap_fps", "session": "ab12cd34", "fps": 15}  限制帧率,null取消限制
+#   {"cmd": "refresh", "session": "ab12cd34"}         立即推送一帧完整画面
+#   {"cmd": "disconnect", "session": "ab12cd34"}      断开会话
+# session为会话令牌的前几位(日志中显示的8位即可)
+CONTROL_HOSTS = ("127.0.0.1", "::1")
+
+
+def session_summary(session):
+    """会话的状态摘要:各通道地址、注入线程、画质档位、帧率、字节数、队列长度"""
+    width, height, quality, name = session.quality_manager.current_config
+    thread = session.input_queue.thread
+    return {
+        "id": session.token[:8],
+        "channels": {channel: session.addresses.get(channel) for channel in session.channels},
+        "threads": {"input": thread.name if thread.is_alive() else f"{thread.name}(已退出)",
+                    "capture": "截图进程" if capture_worker is not None else "截图线程池"},
+        "tier": {"width": width, "height": height, "quality": quality, "name": name,
+                 "pinned": session.quality_manager.pinned_config is not None},
+        "max_fps": session.max_fps,
+        "idle": session.idle,
+        **session.video_stats,
+        "input_queue": session.input_queue.depth(),
+        "view_size": session.view_size,
+    }
+
+
+def find_session_by_id(session_id):
+    """按令牌前缀查找会话,找不到或前缀对应多个会话时抛出LookupError"""
+    matches = [session for token, session in sessions.items() if session_id and token.startswith(str(session_id))]
+    if len(matches) != 1:
+        raise LookupError(f"找不到会话 {session_id}" if not matches else f"会话前缀 {session_id} 不唯一")
+    return matches[0]
+
+
+def resolve_tier(tier):
+    """档位序号(按帧率区间从低到高)或[宽,高,质量]转换为画质配置,None表示取消固定"""
+    if tier is None:
+        return None
+    if isinstance(tier, int):
+        if not 0 <= tier < len(QUALITY_CONFIG):
+            raise ValueError(f"档位序号必须在0到{len(QUALITY_CONFIG) - 1}之间")
+        return [config for _, config in sorted(QUALITY_CONFIG.items())][tier]
+    width, height, quality = (int(value) for value in tier)
+    return (width, height, quality, f"手动固定: {width}×{height} 质量{quality}")
+
+
+SESSION_COMMANDS = ("pin", "cap_fps", "refresh", "disconnect") # 需要指定会话的控制命令
+
+
+async def run_control_command(command):
+    """执行一条控制命令,返回结果字典"""
+    action = command.get("cmd")
+    if action == "list":
+        return {"ok": True, "sessions": [session_summary(session) for session in list(sessions.values())]}
+    if action == "profile": # 在后台线程中采样,立即返回输出文件路径,不等采样结束
+        try:
+            run = profiler.start_profile(_positive(command.get("seconds", profiler.DEFAULT_DURATION)), "server")
+        except RuntimeError as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "seconds": run.duration, "output": run.output + ".collapsed", "summary": run.output + ".txt"}
+    if action not in SESSION_COMMANDS: # 先确认命令有效,再查找会话,错误信息指出真正的问题
+        raise ValueError(f"未知命令: {action}")
+
+    session = find_session_by_id(command.get("session"))
+    if action == "pin":
+        pinned = resolve_tier(command.get("tier"))
+        session.quality_manager.pinned_config = pinned
+        if pinned is not None: # 立即生效,回复中的画质就是固定后的档位,不必等下一帧
+            session.quality_manager.current_config = pinned
+    elif action == "cap_fps":
+        fps = command.get("fps")
+        session.max_fps = None if fps is None else _frame_rate(fps)
+    elif action == "refresh":
+        session.request_refresh()
+    elif action == "disconnect":
+        summary = session_summary(session)
+        await session.disconnect()
+        print(f"控制接口断开了会话 {summary['id']}")
+        return {"ok": True, "session": summary}
+    print(f"控制接口: {action} 会话 {session.token[:8]}")
+    return {"ok": True, "session": session_summary(session)}
+
+
+async def handle_control_client(reader, writer):
+    """处理本地控制连接的协程"""
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                reply = await run_control_command(json.loads(line))
+            except (ValueError, LookupError, TypeError, AttributeError) as e:
+                reply = {"ok": False, "error": str(e)}
+            writer.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+            await writer.drain()
+    except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+        pass
+    finally:
+        writer.close()
+
+
+def control_command(args, port):
+    """命令行控制工具:python tcp_sever.py --control list | pin 会话 档位 | cap_fps 会话 帧率 | refresh 会话 | disconnect 会话
+    | profile [秒数]"""
+    command = {"cmd": args[0] if args else "list"}
+    if command["cmd"] == "profile":
+        if len(args) > 1:
+            command["seconds"] = float(args[1])
+    elif len(args) > 1:
+        command["session"] = args[1]
+    if len(args) > 2:
+        try:
+            value = json.loads(args[2])
+        except ValueError:
+            value = args[2]
+        command["tier" if command["cmd"] == "pin" else "fps"] = value
+    elif command["cmd"] in ("pin", "cap_fps"):
+        command["tier" if command["cmd"] == "pin" else "fps"] = None # 不给值表示取消
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(json.dumps(command).encode('utf-8') + b'\n')
+        reply = json.loads(sock.makefile('rb').readline())
+    print(json.dumps(reply, ensure_ascii=False, indent=2))
+    return reply
+# ================= 本地控制接口部分 =================
+
+
+# ================= 连接调度部分 =================
+active_tasks = set() # 所有活动连接的协程任务,关闭时统一取消
+# 每个通道同时服务的连接数上限(UDP视频计入video),超出时回一行错误消息后立即关闭,重连风暴时资源占用也有上限
+DEFAULT_CONNECTION_LIMIT = 16
+MAX_CONNECTIONS = dict.fromkeys(("video", "mouse", "keyboard"), DEFAULT_CONNECTION_LIMIT)
+MAX_SESSIONS = 32 # 会话数上限(含宽限期内等待重连的会话)
+connection_counts = dict.fromkeys(MAX_CONNECTIONS, 0) # 通道名 -> 当前连接数
+SHUTDOWN_TIMEOUT = 2.0 # 关闭时等待连接清理、注入队列执行完已入队事件的最长时间(秒)
+
+
+def parse_connection_limits(value):
+    """配置项max_connections:一个整数(三个通道相同)或{"video": 16, "mouse": 16, "keyboard": 16},没写的通道用默认值"""
+    if not isinstance(value, dict):
+        value = dict.fromkeys(MAX_CONNECTIONS, value)
+    limits = dict.fromkeys(MAX_CONNECTIONS, DEFAULT_CONNECTION_LIMIT)
+    for channel, limit in value.items():
+        if channel not in limits:
+            raise ValueError(f"未知的通道 {channel}")
+        limits[channel] = int(_positive(limit))
+    return limits
+
+
+async def reject_connection(writer, reason, message):
+    """拒绝连接:回一行错误消息{"type": "error"}(客户端据此提示并退避重连),然后关闭"""
+    error = {"type": "error", "reason": reason, "message": message}
+    try:
+        writer.write(json.dumps(error).encode('utf-8') + b'\n')
+        await asyncio.wait_for(writer.drain(), 1.0)
+    except (OSError, asyncio.TimeoutError):
+        pass
+    writer.close()
+
+
+def track_connection(handler, channel, label):
+    """包装连接处理协程:超过通道连接数上限时直接拒绝,否则计数并记录活动连接,以便关闭时统一取消
+    已满时先读取握手:恢复会话的客户端会顶替自己在该通道上的旧连接,不会被自己还没断开的旧连接挡住"""
+    async def wrapper(reader, writer):
+        client_address = writer.get_extra_info('peername')
+        limit = MAX_CONNECTIONS[channel]
+        greeting = None
+        if connection_counts[channel] >= limit:
+            greeting = await read_session_hello(reader)
+            if not has_live_channel(find_session(greeting[0]), channel):
+                print(f"{label}连接数已达上限({limit}),拒绝客户端 {client_address}")
+                await reject_connection(writer, "busy", f"服务端{label}连接已满({limit}),请稍后重试")
+                return
+        connection_counts[channel] += 1
+        task = asyncio.current_task()
+        active_tasks.add(task)
+        print(f"{label}客户端已连接: {client_address}")
+        try:
+            await handler(reader, writer, greeting)
+        except asyncio.CancelledError:
+            pass # 服务器关闭时被取消,正常结束
+        finally:
+            connection_counts[channel] -= 1
+            active_tasks.discard(task)
+    return wrapper
+
+
+def start_udp_video_session(session):
+    """UDP监听收到新客户端的HELLO时调用,在事件循环中启动推流任务;视频连接已满时关闭会话,客户端收不到帧会退避重连"""
+    if connection_counts["video"] >= MAX_CONNECTIONS["video"] and not has_live_channel(
+            sessions.get(session.token), "video"): # 恢复会话时顶替旧的视频连接
+        print(f"视频连接数已达上限({MAX_CONNECTIONS['video']}),拒绝UDP客户端 {session.address}")
+        session.close()
+        return
+    print(f"UDP视频客户端已连接: {session.address}")
+    connection_counts["video"] += 1
+    task = asyncio.ensure_future(handle_udp_video_client(session))
+    active_tasks.add(task)
+    task.add_done_callback(udp_video_finished)
+
+
+def authorize_udp_token(token):
+    """UDP视频HELLO必须携带经TCP鼠标通道发放的有效会话令牌,否则伪造源地址的HELLO会让服务端向第三方推流"""
+    return token is not None and token in sessions
+
+
+def udp_video_finished(task):
+    """UDP推流任务结束后移出活动集合并释放连接数"""
+    active_tasks.discard(task)
+    connection_counts["video"] -= 1
+
+
+LISTEN_BACKLOG = 100 # 监听队列长度,只在启动时读取
+
+
+def create_listen_sockets(port, sock_type=socket.SOCK_STREAM):
+    """在所有网卡上监听指定端口,返回socket列表
+    优先使用一个IPV6_V6ONLY=0的双栈socket同时接收IPv4和IPv6连接,系统不支持时IPv4/IPv6各开一个"""
+    if socket.has_dualstack_ipv6():
+        try:
+            return [_bind_listen_socket(socket.AF_INET6, "::", port, sock_type, v6only=0)]
+        except OSError as e:
+            print(f"双栈监听失败: {e},改为IPv4/IPv6分别监听")
+
+    sockets = [_bind_listen_socket(socket.AF_INET, "0.0.0.0", port, sock_type)]
+    if socket.has_ipv6:
+        try:
+            sockets.append(_bind_listen_socket(socket.AF_INET6, "::", port, sock_type, v6only=1))
+        except OSError as e: # 本机未启用IPv6时只监听IPv4
+            print(f"IPv6监听失败: {e}")
+    return sockets
+
+
+def _bind_listen_socket(family, host, port, sock_type, v6only=None):
+    """创建并绑定一个监听socket(TCP会同时开始listen)"""
+    sock = socket.socket(family, sock_type)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if v6only is not None: # 0:同一个socket也接收IPv4连接(地址形如::ffff:1.2.3.4)
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, v6only)
+        sock.bind((host, port))
+        if sock_type == socket.SOCK_STREAM:
+            sock.listen(LISTEN_BACKLOG)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+async def serve(video_port, mouse_port, keyboard_port, stop_event, config=None, control_port=None):
+    """在同一个事件循环中服务视频、鼠标、键盘三个通道,直到stop_event被设置
+    config为(配置文件路径, 启动参数覆盖)时监视配置文件,修改后在事件循环中热加载
+    control_port不为None时在本机回环地址上开放控制接口"""
+    global capture_worker, capture_executor, injector
+    loop = asyncio.get_running_loop()
+    capture_executor = ThreadPoolExecutor(max_workers=CAPTURE_WORKERS, thread_name_prefix="capture")
+    if injector is None: # 配置文件指定了其他注入后端时apply_config已经创建
+        injector = input_backend.create_backend(INPUT_BACKEND)
+    shutdown = asyncio.Event()
+    watcher = None
+    if config is not None:
+        watcher = settings.ConfigWatcher(config[0], "server", lambda values: loop.call_soon_threadsafe(
+            apply_config, values), config[1])
+
+    # stop_event由GUI线程或信号设置,用一个等待线程把它转发到事件循环,关闭时无需轮询等待超时
+    def wait_for_stop():
+        stop_event.wait()
+        try:
+            loop.call_soon_threadsafe(shutdown.set)
+        except RuntimeError:
+            pass # 事件循环已经结束
+
+    threading.Thread(target=wait_for_stop, name="stop-waiter", daemon=True).start()
+
+    servers = []
+    udp_protocols = [] # UDP视频监听协议对象
+    try:
+        if CAPTURE_IN_PROCESS:
+            import capture_process
+            # 帧环槽数按视频连接数上限分配(热加载调大上限不会扩环,超出时极少数帧退回本进程编码)
+            capture_worker = capture_process.CaptureProcess(
+                max(capture_process.RING_SLOTS, MAX_CONNECTIONS["video"] + capture_process.RING_SPARE_SLOTS))
+            print(f"    截图进程已启动(PID {capture_worker.process.pid}),帧数据经共享内存传回")
+
+        # 每个通道在所有网卡上双栈监听,客户端用IPv4或IPv6都能连上同一个服务端
+        for sock in create_listen_sockets(video_port):
+            # asyncio.start_server 接管监听Socket,每个新连接在事件循环中以协程运行
+            servers.append(await asyncio.start_server(track_connection(handle_video_client, "video", "视频"), sock=sock))
+        print("    视频服务器已启动,等待连接...")
+
+        # 可选的UDP视频传输,与TCP视频共用同一端口号;鼠标键盘仍走TCP
+        for sock in create_listen_sockets(video_port, socket.SOCK_DGRAM):
+            _, protocol = await loop.create_datagram_endpoint(
+                lambda: udp_video.UdpVideoServerProtocol(start_udp_video_session, authorize_udp_token), sock=sock)
+            udp_protocols.append(protocol)
+        print("    UDP视频服务器已启动,等待连接...")
+
+        # 同理创建鼠标和键盘控制监听
+        for sock in create_listen_sockets(mouse_port):
+            servers.append(await asyncio.start_server(track_connection(handle_mouse_client, "mouse", "鼠标控制"), sock=sock))
+        print("    鼠标控制服务器已启动,等待连接...")
+
+        for sock in create_listen_sockets(keyboard_port):
+            servers.append(await asyncio.start_server(track_connection(handle_keyboard_client, "keyboard", "键盘控制"), sock=sock))
+        print("    键盘控制服务器已启动,等待连接...")
+
+        if control_port is not None: # 控制接口只监听回环地址,其他机器连不上
+            for host in CONTROL_HOSTS:
+                try:
+                    servers.append(await asyncio.start_server(handle_control_client, host, control_port))
+                except OSError as e: # 没有IPv6时::1不可用
+                    print(f"    控制接口无法监听 {host}: {e}")
+            print(f"    本地控制接口已启动(端口 {control_port})")
+        print(f"    启动耗时: {(time.time() - STARTUP_TIME) * 1000:.0f}ms")
+        print("\n")
+        loop.run_in_executor(capture_executor, warm_up_capture) # 开始监听之后再导入截图相关的库
+
+        await shutdown.wait() # 等待停止信号
+    finally:
+        # 有序关闭:停止监听,取消所有连接(各连接在清理中释放按键、关闭socket),丢弃尚未开始的截图任务,
+        # 再作废所有会话(松开仍按着的鼠标左键),等注入队列执行完已入队的事件;等待总共不超过SHUTDOWN_TIMEOUT
+        deadline = time.time() + SHUTDOWN_TIMEOUT
+        for server in servers:
+            server.close()
+        for protocol in udp_protocols:
+            protocol.close()
+        for task in list(active_tasks):
+            task.cancel()
+        if active_tasks:
+            _, pending = await asyncio.wait(list(active_tasks), timeout=SHUTDOWN_TIMEOUT)
+            if pending:
+                print(f"{len(pending)} 个连接未能在 {SHUTDOWN_TIMEOUT:g} 秒内结束")
+        capture_executor.shutdown(wait=False, cancel_futures=True)
+        queues = []
+        for session in list(sessions.values()):
+            if session.expire_handle is not None:
+                session.expire_handle.cancel()
+            queues.append(session.input_queue)
+            session.expire()
+        await loop.run_in_executor(None, drain_input_queues, queues, deadline)
+        if capture_worker is not None:
+            await loop.run_in_executor(None, capture_worker.close)
+            capture_worker = None
+        if watcher is not None:
+            watcher.stop()
+        print("所有服务器已关闭")
+
+
+def drain_input_queues(queues, deadline):
+    """等待已关闭的注入队列执行完剩余事件,最晚到deadline"""
+    for input_queue in queues:
+        input_queue.join(max(0.0, deadline - time.time()))
+        if input_queue.thread.is_alive():
+            print(f"注入线程 {input_queue.thread.name} 未能按时结束")
+# ================= 连接调度部分 =================
+
+
+# ================= 配置加载部分 =================
+# 参数来自配置文件的"server"节和启动参数--set(见settings.py),没有配置的项使用下面的默认值
+# 端口只在启动时读取;control_port为本地控制接口,设为null关闭
+SERVER_PORTS = {"video_port": 8585, "mouse_port": 8586, "keyboard_port": 8587, "control_port": 8588}
+CLIENT_MOUSE_MOVE_THROTTLE = None # 下发给客户端的鼠标移动限频(秒),None时客户端用自己的设置
+STARTUP_SETTINGS = {"listen_backlog": ("LISTEN_BACKLOG", int)} # 端口以外只在启动时读取的配置项
+
+
+def _positive(value):
+    value = float(value)
+    if value <= 0:
+        raise ValueError("必须大于0")
+    return value
+
+
+def _frame_rate(value):
+    """帧率类配置:必须大于0,低于MIN_FPS时按MIN_FPS处理"""
+    value = _positive(value)
+    if value < MIN_FPS:
+        print(f"帧率 {value:g} 过低,按 {MIN_FPS:g} FPS 处理")
+    return max(value, MIN_FPS)
+
+
+# 可热加载的配置项 -> (全局变量名, 校验转换函数);修改后对正在运行的会话立即生效,不断开任何连接
+HOT_SETTINGS = {
+    "max_fps": ("MAX_FPS", _frame_rate),
+    "idle_fps": ("IDLE_FPS", lambda value: None if value is None else _frame_rate(value)),
+    "idle_timeout": ("IDLE_TIMEOUT", _positive),
+    "screen_change_threshold": ("SCREEN_CHANGE_THRESHOLD", float),
+    "quality_config": ("QUALITY_CONFIG", parse_quality_config),
+    "adjust_interval": ("QUALITY_ADJUST_INTERVAL", float),
+    "repeat_delay": ("KEY_REPEAT_DELAY", _positive),
+    "repeat_interval": ("KEY_REPEAT_INTERVAL", _positive),
+    "input_backend": ("INPUT_BACKEND", str),
+    "mouse_move_throttle": ("CLIENT_MOUSE_MOVE_THROTTLE", lambda value: None if value is None else float(value)),
+    "max_connections": ("MAX_CONNECTIONS", parse_connection_limits),
+    "max_sessions": ("MAX_SESSIONS", lambda value: int(_positive(value))),
+    "read_timeout": ("MOUSE_READ_TIMEOUT", _positive),
+}
+CONFIG_DEFAULTS = {key: globals()[name] for key, (name, _) in HOT_SETTINGS.items()} # 配置文件删掉某项时恢复默认
+
+
+def apply_config(values, initial=False):
+    """应用一份完整的服务端配置(缺少的项恢复默认);启动时initial为True,端口此时才生效"""
+    global injector
+    for key in SERVER_PORTS:
+        if key in values and values[key] != SERVER_PORTS[key]:
+            if initial:
+                SERVER_PORTS[key] = None if values[key] is None else int(values[key])
+            else:
+                print(f"配置项 {key} 需要重启服务端才能生效")
+    for key, (name, convert) in STARTUP_SETTINGS.items():
+        if key in values and values[key] != globals()[name]:
+            if not initial:
+                print(f"配置项 {key} 需要重启服务端才能生效")
+                continue
+            try:
+                globals()[name] = convert(values[key])
+            except (TypeError, ValueError) as e:
+                print(f"配置项 {key} 无效({e}),使用默认值")
+    for key in values:
+        if key not in HOT_SETTINGS and key not in SERVER_PORTS and key not in STARTUP_SETTINGS:
+            print(f"未知的配置项: {key}")
+
+    for key, (name, convert) in HOT_SETTINGS.items():
+        try:
+            value = convert(values[key]) if key in values else CONFIG_DEFAULTS[key]
+        except (TypeError, ValueError, KeyError) as e:
+            print(f"配置项 {key} 无效({e}),保持原值")
+            continue
+        if value == globals()[name]:
+            continue
+        if key == "input_backend": # 换注入后端:新建成功才替换,注入线程下一个事件起使用新后端
+            try:
+                injector = input_backend.create_backend(value)
+            except (OSError, ValueError, AttributeError, ImportError) as e:
+                print(f"注入后端 {value} 不可用({e}),保持原后端")
+                continue
+        globals()[name] = value
+        if not initial:
+            print(f"配置已更新: {key} = {values.get(key, '默认值')}")
+            if key == "mouse_move_throttle": # 推送给所有已连接的客户端
+                for session in list(sessions.values()):
+                    session.send_control({"type": "config", "mouse_move_throttle": value})
+# ================= 配置加载部分 =================
+
+
+# ================= gui界面 =================
+HEADLESS = "--headless" in sys.argv # 无界面模式:不创建Tk窗口,本机地址只在控制台显示
+
+
+def create_gui(stop_event):
+    """创建Tkinter GUI界面"""
+    from tkinter import Tk, Label, Button # 无界面模式不导入tkinter
+    root = Tk()
+    root.title("F_RC") # 设置窗口名称
+    root.geometry("500x170") # 设置窗口大小
+    root.iconbitmap('exe.ico')
+    #root.resizable(False, False) # 禁止调整窗口大小
+
+    # 计算窗口居中位置
+    screen_width = root.winfo_screenwidth() # 获取屏幕宽度,像素
+    screen_height = root.winfo_screenheight() # 获取屏幕高度
+    x = (screen_width - 500) // 2 # 水平居中坐标
+    y = (screen_height - 170) // 2 # 垂直居中坐标
+    root.geometry(f"500x170+{x}+{y}") # 设置窗口位置
+
+    # 创建标签组件,显示本机IPv4和IPv6地址(服务端双栈监听,两个地址都能连)
+    address_text = "IPv4: {}\nIPv6: {}".format(*local_addresses()) # 与控制台共用同一次获取的结果
+    Label(root, text=address_text, font=('黑体', 14, 'bold')).pack(pady=10)
+    #Label(root, text="点击窗口关闭按钮退出程序", fg="red").pack(pady=5)
+
+    # 性能采样按钮:点击后在后台采样所有线程,结束后在状态标签显示输出文件
+    profile_status = Label(root, text="")
+
+    def start_profile():
+        try:
+            run = profiler.start_profile(profiler.DEFAULT_DURATION, "server")
+        except RuntimeError as e:
+            profile_status.config(text=str(e))
+            return
+        profile_button.config(state="disabled")
+        profile_status.config(text=f"正在采样 {run.duration:g} 秒...")
+
+        def check_done():
+            if not run.done.is_set():
+                root.after(500, check_done)
+                return
+            profile_button.config(state="normal")
+            text = f"采样失败: {run.error}" if run.error else f"已写入 {os.path.basename(run.output)}.collapsed / .txt"
+            profile_status.config(text=text)
+
+        root.after(500, check_done)
+
+    profile_button = Button(root, text=f"性能采样({profiler.DEFAULT_DURATION:g}秒)", command=start_profile)
+    profile_button.pack()
+    profile_status.pack()
+
+    def on_close():
+        """窗口关闭按钮的回调函数"""
+        print("GUI窗口关闭，程序将退出")
+        stop_event.set() # 设置全局停止事件(通知其他线程退出)
+        root.destroy() # 销毁窗口对象,释放资源
+
+    root.protocol("WM_DELETE_WINDOW", on_close) # 绑定窗口关闭事件(点击标题栏关闭按钮时触发)
+    root.mainloop() # 启动GUI主循环
+# ================= gui界面 =================
+
+
+# ================= 主函数 =================
+def main(stop_event):
+    """主服务函数，负责创建Socket并监听连接"""
+    config_file, config_values, overrides = settings.load("server") # 配置文件 + 启动参数--set
+    apply_config(config_values, initial=True)
+    video_port = SERVER_PORTS["video_port"]
+    mouse_port = SERVER_PORTS["mouse_port"]
+    keyboard_port = SERVER_PORTS["keyboard_port"]
+
+    def print_banner():
+        ipv4, ipv6 = local_addresses()
+        print(f"""
+    =====================================
+    远程控制服务端启动(IPv4/IPv6双栈,监听所有网卡)
+    IPv4地址: {ipv4}
+    IPv6地址: [{ipv6}]
+    视频端口: {video_port}
+    鼠标端口: {mouse_port}
+    键盘端口: {keyboard_port}
+    =====================================
+    """)
+
+    # 获取本机地址可能要执行ipconfig,放到后台线程,不推迟开始监听
+    threading.Thread(target=print_banner, name="banner", daemon=True).start()
+
+    try:
+        # asyncio.run 创建事件循环并运行服务,直到停止事件被设置
+        asyncio.run(serve(video_port, mouse_port, keyboard_port, stop_event, config=(config_file, overrides),
+                          control_port=SERVER_PORTS["control_port"]))
+    except Exception as e:
+        print(f"主循环异常: {e}")
+        traceback.print_exc()
+
+
+def startup_benchmark(runs=5, extra_args=()):
+    """启动时间基准:以无界面模式反复启动服务端子进程,测量从启动进程到最后一个端口(键盘)可以连接的耗时
+    extra_args(如--config/--set)原样传给服务端,返回每次的耗时(秒)"""
+    config_values = settings.load("server", [""] + list(extra_args))[1]
+    port = int(config_values.get("keyboard_port", SERVER_PORTS["keyboard_port"]))
+    timings = []
+    for run in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--headless", *extra_args],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"服务端进程提前退出(返回码 {process.returncode})")
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                    break
+                except OSError:
+                    time.sleep(0.005)
+            timings.append(time.perf_counter() - start)
+            print(f"第 {run + 1} 次: {timings[-1] * 1000:.0f}ms")
+        finally:
+            process.terminate()
+            process.wait()
+    timings.sort()
+    print(f"启动到开始监听: 中位数 {timings[len(timings) // 2] * 1000:.0f}ms "
+          f"最快 {timings[0] * 1000:.0f}ms 最慢 {timings[-1] * 1000:.0f}ms")
+    return timings
+# ================= 主函数 =================
+
+
+
+if __name__ == "__main__":
+    if "--startup-bench" in sys.argv: # python tcp_sever.py --startup-bench [次数] [--config 文件] [--set 键=值]
+        bench_index = sys.argv.index("--startup-bench")
+        rest = sys.argv[bench_index + 1:]
+        runs = int(rest.pop(0)) if rest and rest[0].isdigit() else 5
+        startup_benchmark(runs, sys.argv[1:bench_index] + rest)
+        sys.exit()
+    if "--control" in sys.argv: # python tcp_sever.py --control list / pin 会话 档位 / cap_fps 会话 帧率 / ...
+        control_values = settings.load("server")[1]
+        control_command(sys.argv[sys.argv.index("--control") + 1:],
+                        int(control_values.get("control_port", SERVER_PORTS["control_port"])))
+        sys.exit()
+
+    request_admin_privileges() # 程序入口处强制检查权限(截图子进程和命令行控制工具不需要)
+    stop_event = threading.Event() # 创建线程间通信的事件对象,用于通知关闭程序
+
+    # 设置主线程的信号处理,Ctrl+C与关闭窗口一样通知所有线程退出
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    print("提示: 按Ctrl+C也可以退出程序")
+    # 性能采样: kill -USR1 <PID>(Windows控制台按Ctrl+Break),或 --control profile [秒数],或窗口上的按钮
+    profiler.install_signal_handler("server")
+
+    # 启动GUI线程(--headless不创建窗口,只在控制台输出,Ctrl+C退出)
+    if not HEADLESS:
+        gui_thread = threading.Thread(target=create_gui, args=(stop_event,), name="gui", daemon=True)
+        gui_thread.start()
+
+    # 启动服务器线程
+    server_thread = threading.Thread(target=main, args=(stop_event,), name="server", daemon=True)
+    server_thread.start()
+
+    # 主线程循环等待停止事件
+    try:
+        while not stop_event.is_set():
+            time.sleep(0.1)
+        print("收到退出信号，程序即将退出")
+    finally:
+        stop_event.set() # 确保设置停止标志
+        # 服务器线程有序关闭所有连接和会话(限时SHUTDOWN_TIMEOUT秒),截图进程另外最多需要几秒退出
+        server_thread.join(timeout=SHUTDOWN_TIMEOUT + 5.0)
+        if server_thread.is_alive():
+            print("服务器线程未能按时结束,强制退出")
+        print("程序已完全退出")
\ No newline at end of file
@@ -0,0 +1,491 @@
+import socket
+import struct
+import time
+import random
+import threading
+import selectors
+import asyncio
+import sys
+from collections import OrderedDict
+
+
+# ================= UDP视频传输协议 =================
+# 每个数据报 = 9字节头 + 负载
+# 头部: 类型(1字节) 帧序号(4字节) 分片序号(2字节) 分片总数(2字节), 大端序
+HEADER = struct.Struct("!BIHH")
+PACKET_DATA = 1   # 视频帧分片 (服务端 -> 客户端)
+PACKET_NACK = 2   # 缺失分片重传请求, 负载为若干2字节分片序号 (客户端 -> 服务端)
+PACKET_HELLO = 3  # 注册/保活, 负载为可选的会话令牌 (客户端 -> 服务端)
+PACKET_BYE = 4    # 客户端主动结束 (客户端 -> 服务端)
+PACKET_VIEW = 5   # 客户端窗口尺寸, 负载为宽高各2字节 (客户端 -> 服务端)
+VIEW_SIZE = struct.Struct("!HH")
+
+DEFAULT_PAYLOAD_SIZE = 1200  # 分片负载大小, 保守取值以避开IPv6/隧道链路上的IP分片
+SEND_HISTORY = 8             # 服务端只为最近8帧保留分片, 更旧的帧不再重传
+FRAME_DEADLINE = 0.2         # 客户端重组截止时间(秒), 超时未完成的帧直接放弃
+NACK_DELAY = 0.01            # 分片停止到达多久后发送NACK(秒)
+MAX_NACKS = 2                # 每帧最多请求重传次数
+HELLO_INTERVAL = 1.0         # 客户端保活间隔(秒)
+SESSION_TIMEOUT = 5.0        # 服务端多久收不到保活就结束会话(秒)
+RESEND_RATE = 2000           # 每个会话每秒最多重传的分片数, 超出的NACK直接忽略
+RESEND_BURST = 400           # 重传允许的突发分片数
+
+
+def pack_packet(packet_type, frame_id=0, index=0, count=0, payload=b""):
+    """打包一个UDP数据报"""
+    return HEADER.pack(packet_type, frame_id, index, count) + payload
+
+
+def unpack_packet(packet):
+    """解析UDP数据报, 返回(类型, 帧序号, 分片序号, 分片总数, 负载), 格式错误返回None"""
+    if len(packet) < HEADER.size:
+        return None
+    packet_type, frame_id, index, count = HEADER.unpack_from(packet)
+    return packet_type, frame_id, index, count, memoryview(packet)[HEADER.size:]
+# ================= UDP视频传输协议 =================
+
+
+# ================= 服务端发送部分 =================
+class UdpFrameSender:
+    """把编码后的视频帧切成MTU大小的分片发送, 并按NACK重传最近几帧的缺失分片"""
+
+    def __init__(self, send, payload_size=DEFAULT_PAYLOAD_SIZE, history=SEND_HISTORY):
+        self.send = send  # send(packet) 发送一个数据报
+        self.payload_size = payload_size
+        self.history = history
+        self.frame_id = 0
+        self.recent = OrderedDict()  # 帧序号 -> 分片数据报列表
+        self.retransmit_count = 0
+        self.resend_budget = RESEND_BURST  # 令牌桶: 剩余可重传的分片数, 按RESEND_RATE补充
+        self.budget_time = time.monotonic()
+
+    def send_frame(self, data):
+        """发送一帧, 返回帧序号"""
+        self.frame_id += 1
+        view = memoryview(data)
+        count = max(1, (len(data) + self.payload_size - 1) // self.payload_size)
+        packets = [
+            pack_packet(PACKET_DATA, self.frame_id, i, count,
+                        view[i * self.payload_size:(i + 1) * self.payload_size])
+            for i in range(count)
+        ]
+        self.recent[self.frame_id] = packets
+        while len(self.recent) > self.history:
+            self.recent.popitem(last=False)
+        for packet in packets:
+            self.send(packet)
+        return self.frame_id
+
+    def handle_nack(self, frame_id, payload):
+        """重传NACK中列出的分片, 已超出历史窗口的旧帧直接忽略
+        重传按令牌桶限速, 反复发送的NACK不能让服务端无限放大流量"""
+        packets = self.recent.get(frame_id)
+        if packets is None:
+            return 0
+        now = time.monotonic()
+        self.resend_budget = min(RESEND_BURST, self.resend_budget + (now - self.budget_time) * RESEND_RATE)
+        self.budget_time = now
+        resent = 0
+        for (index,) in struct.iter_unpack("!H", payload[:len(payload) - len(payload) % 2]):
+            if self.resend_budget < 1:
+                break
+            if index < len(packets):
+                self.resend_budget -= 1
+                self.send(packets[index])
+                resent += 1
+        self.retransmit_count += resent
+        return resent
+
+
+class UdpVideoSession:
+    """服务端的一个UDP视频会话(以客户端地址区分)"""
+
+    def __init__(self, transport, address):
+        self.address = address
+        self.transport = transport
+        self.sender = UdpFrameSender(lambda packet: transport.sendto(packet, address))
+        self.last_seen = time.time()
+        self.closed = False
+        self.sent_count = 0
+        self.dropped_count = 0  # UDP发送不排队, 不会有被替换的帧
+        self.view_size = None  # 客户端回报的窗口尺寸(宽, 高)
+        self.token = None  # HELLO中携带的会话令牌, 断线重连时用来找回会话
+
+    def send_frame(self, data):
+        return self.sender.send_frame(data)
+
+    def submit(self, data):
+        """推流循环的发送接口, UDP直接发出不阻塞"""
+        self.sender.send_frame(data)
+        self.sent_count += 1
+
+    def is_alive(self):
+        return not self.closed and time.time() - self.last_seen < SESSION_TIMEOUT
+
+    def close(self):
+        self.closed = True
+
+
+class UdpVideoServerProtocol(asyncio.DatagramProtocol):
+    """服务端UDP监听: 收到HELLO时创建会话并回调on_session, 同时处理NACK和BYE
+    UDP源地址可以伪造, authorize(令牌)返回False的HELLO直接忽略(不建会话、不回任何数据),
+    否则任何人都能让服务端把视频流发往第三方地址"""
+
+    def __init__(self, on_session, authorize=None):
+        self.on_session = on_session  # on_session(session) 启动该会话的推流
+        self.authorize = authorize  # authorize(token) 令牌是否有效, None表示不校验(仅用于本地自测)
+        self.sessions = {}
+        self.transport = None
+        self.rejected_count = 0  # 被忽略的HELLO数
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        parsed = unpack_packet(data)
+        if parsed is None:
+            return
+        packet_type, frame_id, _, _, payload = parsed
+        session = self.sessions.get(addr)
+
+        if packet_type == PACKET_HELLO:
+            if session is None or not session.is_alive():
+                token = bytes(payload).decode("ascii", "ignore") or None
+                if self.authorize is not None and not self.authorize(token):
+                    self.rejected_count += 1
+                    return
+                # 客户端重连后换了端口, 旧地址的会话已结束, 顺便清理
+                for old_addr in [a for a, s in self.sessions.items() if s.closed]:
+                    del self.sessions[old_addr]
+                session = UdpVideoSession(self.transport, addr)
+                session.token = token
+                self.sessions[addr] = session
+                self.on_session(session)
+            session.last_seen = time.time()
+        elif session is None:
+            return
+        elif packet_type == PACKET_NACK:
+            session.last_seen = time.time()
+            session.sender.handle_nack(frame_id, payload)
+        elif packet_type == PACKET_VIEW and len(payload) >= VIEW_SIZE.size:
+            session.last_seen = time.time()
+            session.view_size = VIEW_SIZE.unpack_from(payload)
+        elif packet_type == PACKET_BYE:
+            session.close()
+            del self.sessions[addr]
+
+    def error_received(self, exc):
+        # Windows上对端端口不可达会以ICMP错误的形式出现在这里, 会话靠保活超时自然结束
+        pass
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
+        self.sessions.clear()
+        if self.transport is not None:
+            self.transport.close()
+# ================= 服务端发送部分 =================
+
+
+# ================= 客户端接收部分 =================
+class _PartialFrame:
+    """正在重组的一帧"""
+
+    def __init__(self, count, now):
+        self.fragments = [None] * count
+        self.received = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.last_nack = 0.0
+        self.nacks = 0
+
+    def add(self, index, payload, now):
+        if index < len(self.fragments) and self.fragments[index] is None:
+            self.fragments[index] = bytes(payload)
+            self.received += 1
+        self.last_seen = now
+
+    def complete(self):
+        return self.received == len(self.fragments)
+
+    def missing(self):
+        return [i for i, fragment in enumerate(self.fragments) if fragment is None]
+
+
+class UdpFrameReceiver:
+    """客户端分片重组: 按截止时间放弃超时帧, 对缺片帧发送NACK, 新帧完成时丢弃所有更旧的帧"""
+
+    def __init__(self, send, frame_deadline=FRAME_DEADLINE, nack_delay=NACK_DELAY,
+                 max_nacks=MAX_NACKS, max_pending=4):
+        self.send = send  # send(packet) 向服务端发送一个数据报
+        self.frame_deadline = frame_deadline
+        self.nack_delay = nack_delay
+        self.max_nacks = max_nacks
+        self.max_pending = max_pending
+        self.pending = {}  # 帧序号 -> _PartialFrame
+        self.last_delivered = 0
+        self.completed_count = 0
+        self.abandoned_count = 0
+        self.nack_count = 0
+
+    def feed(self, packet, now=None):
+        """处理一个数据报, 某帧重组完成时返回帧数据, 否则返回None"""
+        parsed = unpack_packet(packet)
+        if parsed is None:
+            return None
+        packet_type, frame_id, index, count, payload = parsed
+        if packet_type != PACKET_DATA or count == 0 or frame_id <= self.last_delivered:
+            return None  # 已显示过更新的帧, 迟到或重复的分片没有意义
+
+        now = time.time() if now is None else now
+        partial = self.pending.get(frame_id)
+        if partial is None:
+            if len(self.pending) >= self.max_pending:
+                oldest = min(self.pending)
+                if frame_id < oldest:
+                    return None
+                del self.pending[oldest]
+                self.abandoned_count += 1
+            partial = self.pending[frame_id] = _PartialFrame(count, now)
+        partial.add(index, payload, now)
+
+        if not partial.complete():
+            return None
+        # 新帧完成: 所有更旧的未完成帧都已过时, 一并放弃
+        for stale_id in [fid for fid in self.pending if fid < frame_id]:
+            del self.pending[stale_id]
+            self.abandoned_count += 1
+        del self.pending[frame_id]
+        self.last_delivered = frame_id
+        self.completed_count += 1
+        return b"".join(partial.fragments)
+
+    def poll(self, now=None):
+        """检查截止时间: 丢弃超时帧, 对停止到达分片的帧发送NACK"""
+        now = time.time() if now is None else now
+        for frame_id, partial in list(self.pending.items()):
+            if now - partial.first_seen > self.frame_deadline:
+                del self.pending[frame_id]
+                self.abandoned_count += 1
+            elif (partial.nacks < self.max_nacks
+                  and now - partial.last_seen >= self.nack_delay
+                  and now - partial.last_nack >= self.nack_delay):
+                missing = partial.missing()
+                payload = struct.pack(f"!{len(missing)}H", *missing)
+                self.send(pack_packet(PACKET_NACK, frame_id, 0, len(missing), payload))
+                partial.nacks += 1
+                partial.last_nack = now
+                self.nack_count += 1
+
+
+class UdpVideoClient:
+    """客户端阻塞式UDP视频接收, recv_frame()的用法与TCP按长度读取一帧相同"""
+
+    def __init__(self, server_address, port, family=socket.AF_INET, token=None, stall_timeout=None):
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.connect((server_address, port))
+        self.sock.settimeout(NACK_DELAY)
+        self.receiver = UdpFrameReceiver(self.sock.send)
+        self.last_hello = 0.0
+        self.view_size = None
+        self.closed = False
+        self.hello = pack_packet(PACKET_HELLO, payload=token.encode("ascii") if token else b"")
+        self.stall_timeout = stall_timeout  # 超过这么久收不到任何数据报就认为链路已断
+        self.last_packet = time.time()
+
+    def recv_frame(self):
+        """阻塞直到收到下一帧完整数据, 连接关闭后返回None, 链路停顿超过stall_timeout时抛出TimeoutError"""
+        while not self.closed:
+            now = time.time()
+            if self.stall_timeout and now - self.last_packet > self.stall_timeout:
+                raise TimeoutError("UDP视频长时间收不到数据")
+            if now - self.last_hello >= HELLO_INTERVAL:
+                self._send(self.hello)
+                if self.view_size:  # 窗口尺寸随保活重发, 丢一个包也无妨
+                    self._send(pack_packet(PACKET_VIEW, payload=VIEW_SIZE.pack(*self.view_size)))
+                self.last_hello = now
+            try:
+                packet = self.sock.recv(65535)
+            except socket.timeout:
+                self.receiver.poll()
+                continue
+            except (ConnectionResetError, OSError):
+                if self.closed:
+                    return None
+                # 服务端UDP端口暂时不可达(ICMP), 继续保活等待
+                time.sleep(NACK_DELAY)
+                continue
+            self.last_packet = time.time()
+            data = self.receiver.feed(packet)
+            self.receiver.poll()
+            if data is not None:
+                return data
+        return None
+
+    def send_view_size(self, width, height):
+        """回报客户端窗口尺寸, 服务端按该尺寸编码"""
+        self.view_size = (min(width, 65535), min(height, 65535))
+        self._send(pack_packet(PACKET_VIEW, payload=VIEW_SIZE.pack(*self.view_size)))
+
+    def _send(self, packet):
+        try:
+            self.sock.send(packet)
+        except OSError:
+            pass
+
+    def close(self):
+        if not self.closed:
+            self._send(pack_packet(PACKET_BYE))
+            self.closed = True
+            self.sock.close()
+# ================= 客户端接收部分 =================
+
+
+# ================= 丢包模拟中继 =================
+class LossyUdpRelay:
+    """本地UDP中继, 按概率丢弃/延迟数据报, 用于在回环地址上测试UDP视频传输"""
+
+    def __init__(self, listen_address, target_address, loss_rate=0.05, delay=0.0,
+                 family=socket.AF_INET, seed=None):
+        self.target_address = target_address
+        self.loss_rate = loss_rate
+        self.delay = delay
+        self.family = family
+        self.random = random.Random(seed)
+        self.listen_sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.listen_sock.bind(listen_address)
+        self.address = self.listen_sock.getsockname()
+        self.upstreams = {}  # 客户端地址 -> 连接服务端的socket
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listen_sock, selectors.EVENT_READ, None)
+        self.stop_event = threading.Event()
+        self.forwarded = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _forward(self, sock, packet, address=None):
+        if self.random.random() < self.loss_rate:
+            self.dropped += 1
+            return
+        self.forwarded += 1
+        send = (lambda: sock.sendto(packet, address)) if address else (lambda: sock.send(packet))
+        if self.delay > 0:
+            threading.Timer(self.delay, send).start()
+        else:
+            send()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            for key, _ in self.selector.select(timeout=0.1):
+                try:
+                    if key.data is None:
+                        packet, client = self.listen_sock.recvfrom(65535)
+                        upstream = self.upstreams.get(client)
+                        if upstream is None:
+                            upstream = socket.socket(self.family, socket.SOCK_DGRAM)
+                            upstream.connect(self.target_address)
+                            self.upstreams[client] = upstream
+                            self.selector.register(upstream, selectors.EVENT_READ, client)
+                        self._forward(upstream, packet)
+                    else:
+                        packet = key.fileobj.recv(65535)
+                        self._forward(self.listen_sock, packet, key.data)
+                except OSError:
+                    continue
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=1.0)
+        for upstream in self.upstreams.values():
+            upstream.close()
+        self.listen_sock.close()
+        self.selector.close()
+
+
+def loopback_selftest(frames=300, frame_size=60000, loss_rate=0.05, fps=60):
+    """在回环地址上经丢包中继收发若干帧, 打印送达/放弃/重传统计"""
+    ready = []
+    done_flag = threading.Event()
+
+    async def run_server():
+        loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+
+        def on_session(session):
+            async def stream():
+                for i in range(frames):
+                    session.send_frame(bytes([i % 256]) * frame_size)
+                    await asyncio.sleep(1.0 / fps)
+                done.set()
+            asyncio.ensure_future(stream())
+
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: UdpVideoServerProtocol(on_session), local_addr=("127.0.0.1", 0))
+        ready.append(transport.get_extra_info("sockname"))
+        await done.wait()
+        await asyncio.sleep(FRAME_DEADLINE)
+        protocol.close()
+
+    def server_thread():
+        asyncio.run(run_server())
+        done_flag.set()
+
+    threading.Thread(target=server_thread, daemon=True).start()
+    while not ready:
+        time.sleep(0.01)
+    server_address = ready[0]
+    relay = LossyUdpRelay(("127.0.0.1", 0), server_address, loss_rate=loss_rate, seed=1).start()
+    client = UdpVideoClient(*relay.address)
+
+    delivered = 0
+    corrupted = 0
+
+    def reader():
+        nonlocal delivered, corrupted
+        while True:
+            data = client.recv_frame()
+            if data is None:
+                return
+            delivered += 1
+            if len(data) != frame_size or data.count(data[:1]) != frame_size:
+                corrupted += 1
+
+    threading.Thread(target=reader, daemon=True).start()
+    done_flag.wait(timeout=frames / fps + 10)
+    client.close()
+    relay.stop()
+
+    receiver = client.receiver
+    print(f"UDP回环测试: 发送 {frames} 帧, 丢包率 {loss_rate:.0%}, "
+          f"送达 {delivered}, 放弃 {receiver.abandoned_count}, 损坏 {corrupted}, "
+          f"NACK {receiver.nack_count}, "
+          f"中继丢弃 {relay.dropped}/{relay.dropped + relay.forwarded} 个数据报")
+    return delivered, receiver.abandoned_count, corrupted
+# ================= 丢包模拟中继 =================
+
+
+if __name__ == "__main__":
+    # python udp_video.py selftest [丢包率]
+    # python udp_video.py relay <监听端口> <服务端地址> <服务端端口> [丢包率] [延迟秒]
+    if len(sys.argv) >= 2 and sys.argv[1] == "relay":
+        listen_port = int(sys.argv[2])
+        target = (sys.argv[3], int(sys.argv[4]))
+        loss = float(sys.argv[5]) if len(sys.argv) > 5 else 0.05
+        delay = float(sys.argv[6]) if len(sys.argv) > 6 else 0.0
+        family = socket.AF_INET6 if ":" in target[0] else socket.AF_INET
+        relay = LossyUdpRelay(("::" if family == socket.AF_INET6 else "0.0.0.0", listen_port),
+                              target, loss, delay, family).start()
+        print(f"丢包中继已启动: {relay.address} -> {target}, 丢包率 {loss:.0%}, 延迟 {delay * 1000:.0f}ms")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            relay.stop()
+    else:
+        loss = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+        loopback_selftest(loss_rate=loss)